@@ -0,0 +1,151 @@
+from enum import IntEnum
+from heapq import heappush, heappop
+from typing import Any, Callable
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django_utils.metrics import Counter, Gauge, Histogram
+from django_utils.view_helpers import wrap_view, ViewCall
+import asyncio
+import itertools
+import json
+import math
+import time
+
+
+class Priority(IntEnum):
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+DEFAULT_QUEUE_SIZE = 50
+DEFAULT_QUEUE_TIMEOUT = 2.0
+
+admission_queue_depth = Gauge('admission_queue_depth', 'Requests waiting for admission', labelnames=('gate',))
+admission_wait_seconds = Histogram('admission_wait_seconds', 'Time spent waiting for admission', labelnames=('gate',))
+admission_shed = Counter('admission_shed', 'Requests rejected by admission control', labelnames=('gate',))
+
+
+class AdmissionGate:
+    """
+    Limits number of concurrently executed requests
+    Requests above the limit wait in a bounded priority queue, when queue is full
+    or waiting deadline passes request is shed
+    Gate is used from a single event loop
+    """
+    def __init__(
+        self, name: str, limit: int, max_queue: int = DEFAULT_QUEUE_SIZE, timeout: float = DEFAULT_QUEUE_TIMEOUT
+    ) -> None:
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.queued = 0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._sequence = itertools.count()
+        self.queue_depth = admission_queue_depth.labels(name)
+        self.wait_seconds = admission_wait_seconds.labels(name)
+        self.shed = admission_shed.labels(name)
+
+    async def acquire(self, priority: Priority = Priority.NORMAL) -> bool:
+        """
+        Returns False if request should be shed
+        """
+        if self.active < self.limit and self.queued == 0:
+            self.active += 1
+            return True
+        if self.queued >= self.max_queue:
+            self.shed.inc()
+            return False
+        future = asyncio.get_running_loop().create_future()
+        heappush(self._waiters, (priority, next(self._sequence), future))
+        self.queued += 1
+        self.queue_depth.set(self.queued)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except TimeoutError:
+            if not future.done():
+                future.cancel()
+                self.shed.inc()
+                return False
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was handed over right before cancellation
+                self.release()
+            else:
+                future.cancel()
+            raise
+        finally:
+            self.queued -= 1
+            self.queue_depth.set(self.queued)
+            self.wait_seconds.observe(time.monotonic() - started)
+        return True
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future = heappop(self._waiters)
+            if not future.done():
+                # Slot is passed to the waiter, number of active requests stays the same
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+_global_gate: AdmissionGate | None = None
+
+
+def get_global_gate() -> AdmissionGate | None:
+    """
+    Process wide gate configured with ADMISSION_CONTROL setting, None if admission control is disabled
+    """
+    global _global_gate
+    config: dict[str, Any] | None = getattr(settings, 'ADMISSION_CONTROL', None)
+    if config is None:
+        return None
+    if _global_gate is None:
+        _global_gate = AdmissionGate(
+            'global',
+            limit=config['concurrency'],
+            max_queue=config.get('max_queue', DEFAULT_QUEUE_SIZE),
+            timeout=config.get('timeout', DEFAULT_QUEUE_TIMEOUT),
+        )
+    return _global_gate
+
+
+def service_unavailable(gate: AdmissionGate) -> HttpResponse:
+    response = HttpResponse(
+        json.dumps({'detail': 'Service is overloaded, try again later'}),
+        status=503,
+        content_type='application/json',
+    )
+    response['Retry-After'] = str(max(1, math.ceil(gate.timeout)))
+    return response
+
+
+def admitted(
+    func: Callable[..., Any], url: str, priority: Priority = Priority.NORMAL, max_concurrency: int | None = None
+) -> Callable[..., Any]:
+    """
+    Runs view only after it is admitted by the endpoint gate (if max_concurrency is set) and the global gate
+    Shed requests get 503 with Retry-After without touching the database
+    """
+    endpoint_gate = None
+    if max_concurrency is not None:
+        endpoint_gate = AdmissionGate(url, limit=max_concurrency)
+
+    async def handler(call: ViewCall, request: HttpRequest, response: HttpResponse) -> Any:
+        gates = [gate for gate in (endpoint_gate, get_global_gate()) if gate is not None]
+        acquired: list[AdmissionGate] = []
+        try:
+            for gate in gates:
+                if not await gate.acquire(priority):
+                    return service_unavailable(gate)
+                acquired.append(gate)
+            return await call()
+        finally:
+            for gate in acquired:
+                gate.release()
+
+    return wrap_view(func, handler)
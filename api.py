@@ -1,11 +1,25 @@
+from functools import wraps
 from typing import Any, Callable, Type
+from django.core.exceptions import ImproperlyConfigured
 from django.db import models
+from django.db.models.lookups import Exact
+from django.db.models.sql.where import AND
+from django.http import HttpRequest
 from ninja import Router
 from ninja.pagination import paginate # type: ignore paginate does not support typing
 from ninja.errors import HttpError
 from django_utils.auth import django_auth
-from django_utils.queries import typed_data_list
-from django_utils.pagination import PaginationBase, IDPagination, DateIDPagination
+from django_utils.admission import admitted, Priority
+from django_utils.coalescing import coalesced
+from django_utils.permissions import permission_required, PermissionRequirement
+from django_utils.query_budget import query_budgeted, is_query_budget_enabled
+from django_utils.slow_queries import with_statement_timeout
+from django_utils.db_router import with_replica_reads, get_replica_aliases
+from django_utils.queries import typed_data_first
+from django_utils.pagination import PaginationBase, IDPagination, DateIDPagination, DeltaSyncPagination
+from django_utils.conditional import conditional, check_not_modified, DEFAULT_CACHE_CONTROL
+from django_utils.encoders import fast_json, get_encoder, encode_page
+from django_utils.export import export_response, ExportFormat, DEFAULT_EXPORT_BATCH_SIZE
 from django_utils.schema import (
     Error, TransformSingleFunc, Decorator, SingleItemResponse, TransformListFunc, DataclassProtocol
 )
@@ -15,19 +29,56 @@ def get_response(response_type: type) -> dict[int, type]:
     return {200: response_type, 401: Error, 400: Error, 404: Error}
 
 
+IDENTITY_CACHE_ATTR = '_typed_identity_cache'
+
+
+def get_pk_lookup_value(qset: models.QuerySet[Any]) -> Any | None:
+    """
+    Returns primary key if queryset is filtered only by pk=value, None otherwise
+    """
+    query = qset.query
+    where = query.where
+    if query.annotations or query.is_sliced or where.negated or where.connector != AND or len(where.children) != 1:
+        return None
+    lookup = where.children[0]
+    if not isinstance(lookup, Exact) or hasattr(lookup.rhs, 'resolve_expression'):
+        return None
+    if getattr(lookup.lhs, 'target', None) is not qset.model._meta.pk:
+        return None
+    return lookup.rhs
+
+
 async def get_single_item_or_404(
     qset: models.QuerySet[Any],
     response_type: Type[SingleItemResponse],
     transform: TransformSingleFunc | None = None,
+    request: HttpRequest | None = None,
 ) -> SingleItemResponse:
+    """
+    If request is passed, objects looked up by primary key are cached for the duration of GET request
+    and conditional response is checked if it is enabled for the view
+    Other methods may write between lookups, so they always read the object
+    """
+    cache_key = None
+    identity_cache: dict[Any, Any] = {}
+    if request is not None and transform is None and request.method in ('GET', 'HEAD'):
+        pk = get_pk_lookup_value(qset)
+        if pk is not None:
+            cache_key = (response_type, qset.model, pk)
+            identity_cache = request.__dict__.setdefault(IDENTITY_CACHE_ATTR, {})
+            if cache_key in identity_cache:
+                return identity_cache[cache_key]
     if transform is not None:
         qset = await transform(qset)
-    result = await typed_data_list(qset, response_type)
-    if len(result) == 0:
+    await check_not_modified(request, qset[:2], salt=response_type.__name__)
+    result, has_more = await typed_data_first(qset, response_type)
+    if result is None:
         raise HttpError(404, 'Not found')
-    if len(result) > 1:
+    if has_more:
         raise HttpError(400, 'More than one item found')
-    return result[0]
+    if cache_key is not None:
+        identity_cache[cache_key] = result
+    return result
 
 
 def action(
@@ -35,11 +86,28 @@ def action(
     url: str,
     response_type: Type[DataclassProtocol],
     auth: Any = django_auth,
+    priority: Priority | None = Priority.NORMAL,
+    max_concurrency: int | None = None,
+    max_queries: int | None = None,
+    statement_timeout: float | None = None,
+    permission: PermissionRequirement | None = None,
  ) -> Decorator:
+    """
+    permission is checked against claims in AuthData, user is loaded only if claims are missing
+    priority None disables admission control for the endpoint
+    """
     def wrapper(func: Callable[..., Any]) -> Callable[..., Any]:
         router_decorator: Decorator = router.post(
             url, response=get_response(response_type), auth=auth
         )
+        if is_query_budget_enabled(max_queries):
+            func = query_budgeted(func, url, max_queries, schema=response_type.__name__)
+        if statement_timeout is not None:
+            func = with_statement_timeout(func, statement_timeout)
+        if priority is not None:
+            func = admitted(func, url, priority=priority, max_concurrency=max_concurrency)
+        if permission is not None:
+            func = permission_required(func, permission)
         return router_decorator(func)
     return wrapper
 
@@ -49,11 +117,48 @@ def single_item(
     url: str,
     response_type: Type[SingleItemResponse],
     auth: Any = django_auth,
+    etag_field: str | None = None,
+    cache_control: str = DEFAULT_CACHE_CONTROL,
+    fast_response: bool = False,
+    priority: Priority | None = Priority.NORMAL,
+    max_concurrency: int | None = None,
+    max_queries: int | None = None,
+    statement_timeout: float | None = None,
+    read_replica: bool = True,
+    coalesce_ttl: float | None = None,
+    permission: PermissionRequirement | None = None,
 ) -> Decorator:
+    """
+    etag_field enables conditional responses, view should pass request to get_single_item_or_404
+    fast_response skips ninja validation of returned dataclass and encodes it directly
+    priority None disables admission control for the endpoint
+    coalesce_ttl enables sharing of one execution between identical concurrent requests,
+    result is reused for coalesce_ttl seconds after completion
+    max_queries is the query budget of the view, enforced with QUERY_BUDGET_RAISE and logged in sampled requests
+    statement_timeout overrides database statement timeout (seconds) for queries of the view
+    read_replica allows reads of the view from DATABASE_REPLICAS, unless client is pinned to the primary after a write
+    permission is checked against claims in AuthData, user is loaded only if claims are missing
+    """
     def wrapper(func: Callable[..., models.QuerySet[Any]]) -> Callable[..., Any]:
         router_decorator: Decorator = router.get(
             url, response=get_response(response_type), auth=auth
         )
+        if etag_field is not None:
+            func = conditional(func, field=etag_field, cache_control=cache_control)
+        if fast_response:
+            func = fast_json(func, get_encoder(response_type))
+        if is_query_budget_enabled(max_queries):
+            func = query_budgeted(func, url, max_queries, schema=response_type.__name__)
+        if statement_timeout is not None:
+            func = with_statement_timeout(func, statement_timeout)
+        if read_replica and get_replica_aliases():
+            func = with_replica_reads(func)
+        if priority is not None:
+            func = admitted(func, url, priority=priority, max_concurrency=max_concurrency)
+        if coalesce_ttl is not None:
+            func = coalesced(func, ttl=coalesce_ttl)
+        if permission is not None:
+            func = permission_required(func, permission)
         return router_decorator(func)
 
     return wrapper
@@ -65,11 +170,30 @@ def unpaginated_list(
     response_type: Type[SingleItemResponse],
     auth: Any = django_auth,
     transform: TransformListFunc | None = None,
+    fast_response: bool = False,
+    priority: Priority | None = Priority.NORMAL,
+    max_concurrency: int | None = None,
+    max_queries: int | None = None,
+    statement_timeout: float | None = None,
+    read_replica: bool = True,
+    coalesce_ttl: float | None = None,
 ) -> Decorator:
     def decorator(func: Callable[..., models.QuerySet[Any]]) -> Callable[..., Any]:
         router_decorator: Decorator = router.get(
             url, response=get_response(list[response_type]), auth=auth
         )
+        if fast_response:
+            func = fast_json(func, get_encoder(list[response_type]))
+        if is_query_budget_enabled(max_queries):
+            func = query_budgeted(func, url, max_queries, schema=response_type.__name__)
+        if statement_timeout is not None:
+            func = with_statement_timeout(func, statement_timeout)
+        if read_replica and get_replica_aliases():
+            func = with_replica_reads(func)
+        if priority is not None:
+            func = admitted(func, url, priority=priority, max_concurrency=max_concurrency)
+        if coalesce_ttl is not None:
+            func = coalesced(func, ttl=coalesce_ttl)
         return router_decorator(func)
     return decorator
 
@@ -83,7 +207,33 @@ def api_list(
     date_field: str | None = None,
     transform: TransformListFunc | None = None,
     reverse_order: bool = False,
+    cache_ttl: float | None = None,
+    cache_stale_ttl: float = 0,
+    model: Type[models.Model] | None = None,
+    etag_field: str | None = None,
+    cache_control: str = DEFAULT_CACHE_CONTROL,
+    fast_response: bool = False,
+    priority: Priority | None = Priority.NORMAL,
+    max_concurrency: int | None = None,
+    max_queries: int | None = None,
+    statement_timeout: float | None = None,
+    read_replica: bool = True,
+    coalesce_ttl: float | None = None,
+    permission: PermissionRequirement | None = None,
 ) -> Decorator:
+    """
+    permission is checked against claims in AuthData, user is loaded only if claims are missing
+    priority and max_concurrency configure admission control, priority None disables it for the endpoint
+    max_queries is the query budget of the view, see query_budget.query_budgeted
+    statement_timeout overrides database statement timeout (seconds) for queries of the view
+    read_replica allows reads of the view from DATABASE_REPLICAS, unless client is pinned to the primary after a write
+    coalesce_ttl enables sharing of one execution between identical concurrent requests
+    fast_response writes trusted page dataclasses directly to JSON, without ninja validation
+    model is optional and used only to verify pagination indexes before the first request
+    etag_field (e.g. updated_at) enables ETag/Last-Modified validation based on (id, etag_field) of the page rows
+    cache_ttl enables short lived cache of the first page, shared between all requests with the same filters
+    Stale page is served for cache_stale_ttl seconds more while it is refreshed in background
+    """
     def decorator(func: Callable[..., models.QuerySet[Any]]) -> Callable[..., Any]:
         router_decorator: Decorator = router.get(
             url, response=get_response(list[response_type]), auth=auth
@@ -94,8 +244,30 @@ def api_list(
             date_field=date_field,
             reverse_order=reverse_order,
             transform=transform,
+            cache_ttl=cache_ttl,
+            cache_stale_ttl=cache_stale_ttl,
+            url=url,
+            model=model,
         )
-        return router_decorator(pagination_decorator(func))
+        view = pagination_decorator(func)
+        if etag_field is not None:
+            view = conditional(view, field=etag_field, cache_control=cache_control)
+        if fast_response:
+            item_encoder = get_encoder(response_type)
+            view = fast_json(view, lambda result: encode_page(result, item_encoder))
+        if is_query_budget_enabled(max_queries):
+            view = query_budgeted(view, url, max_queries, schema=response_type.__name__)
+        if statement_timeout is not None:
+            view = with_statement_timeout(view, statement_timeout)
+        if read_replica and get_replica_aliases():
+            view = with_replica_reads(view)
+        if priority is not None:
+            view = admitted(view, url, priority=priority, max_concurrency=max_concurrency)
+        if coalesce_ttl is not None:
+            view = coalesced(view, ttl=coalesce_ttl)
+        if permission is not None:
+            view = permission_required(view, permission)
+        return router_decorator(view)
 
     return decorator
 
@@ -106,6 +278,19 @@ def id_paginated(
     response_type: Type[SingleItemResponse],
     auth: Any = django_auth,
     transform: TransformListFunc | None = None,
+    cache_ttl: float | None = None,
+    cache_stale_ttl: float = 0,
+    model: Type[models.Model] | None = None,
+    etag_field: str | None = None,
+    cache_control: str = DEFAULT_CACHE_CONTROL,
+    fast_response: bool = False,
+    priority: Priority = Priority.NORMAL,
+    max_concurrency: int | None = None,
+    max_queries: int | None = None,
+    statement_timeout: float | None = None,
+    read_replica: bool = True,
+    coalesce_ttl: float | None = None,
+    permission: PermissionRequirement | None = None,
 ) -> Decorator:
     return api_list(
         router=router,
@@ -114,6 +299,19 @@ def id_paginated(
         auth=auth,
         response_type=response_type,
         transform=transform,
+        cache_ttl=cache_ttl,
+        cache_stale_ttl=cache_stale_ttl,
+        model=model,
+        etag_field=etag_field,
+        cache_control=cache_control,
+        fast_response=fast_response,
+        priority=priority,
+        max_concurrency=max_concurrency,
+        max_queries=max_queries,
+        statement_timeout=statement_timeout,
+        read_replica=read_replica,
+        coalesce_ttl=coalesce_ttl,
+        permission=permission,
     )
 
 
@@ -125,6 +323,19 @@ def date_paginated(
     date_field: str = 'created_at',
     transform: TransformListFunc | None = None,
     reverse_order: bool = False,
+    cache_ttl: float | None = None,
+    cache_stale_ttl: float = 0,
+    model: Type[models.Model] | None = None,
+    etag_field: str | None = None,
+    cache_control: str = DEFAULT_CACHE_CONTROL,
+    fast_response: bool = False,
+    priority: Priority = Priority.NORMAL,
+    max_concurrency: int | None = None,
+    max_queries: int | None = None,
+    statement_timeout: float | None = None,
+    read_replica: bool = True,
+    coalesce_ttl: float | None = None,
+    permission: PermissionRequirement | None = None,
 ) -> Decorator:
     return api_list(
         router=router,
@@ -135,4 +346,94 @@ def date_paginated(
         reverse_order=reverse_order,
         auth=auth,
         transform=transform,
+        cache_ttl=cache_ttl,
+        cache_stale_ttl=cache_stale_ttl,
+        model=model,
+        etag_field=etag_field,
+        cache_control=cache_control,
+        fast_response=fast_response,
+        priority=priority,
+        max_concurrency=max_concurrency,
+        max_queries=max_queries,
+        statement_timeout=statement_timeout,
+        read_replica=read_replica,
+        coalesce_ttl=coalesce_ttl,
+        permission=permission,
     )
+
+
+def delta_synced(
+    router: Router,
+    url: str,
+    response_type: Type[SingleItemResponse],
+    auth: Any = django_auth,
+    updated_field: str | None = None,
+    transform: TransformListFunc | None = None,
+    model: Type[models.Model] | None = None,
+    priority: Priority | None = None,
+    max_concurrency: int | None = None,
+) -> Decorator:
+    """
+    Incremental sync of the list, client passes last_id (and last_updated_at) from previous response
+    If updated_field is not set only new records are returned, otherwise new and changed ones
+    Client can pass wait seconds to long poll until the model changes
+    model is required, change notifications are published by every process from the endpoint declaration
+    Admission control is disabled by default, long polls would hold admission slots while idle
+    Reads always use the primary, replica lag would skip changes below the returned last_id
+    """
+    if model is None:
+        raise ImproperlyConfigured(f'delta_synced endpoint {url} requires model')
+    return api_list(
+        router=router,
+        url=url,
+        pagination=DeltaSyncPagination,
+        response_type=response_type,
+        date_field=updated_field,
+        auth=auth,
+        transform=transform,
+        model=model,
+        priority=priority,
+        max_concurrency=max_concurrency,
+        read_replica=False,
+    )
+
+
+def api_export(
+    router: Router,
+    url: str,
+    response_type: Type[SingleItemResponse],
+    auth: Any = django_auth,
+    export_format: ExportFormat = 'ndjson',
+    batch_size: int = DEFAULT_EXPORT_BATCH_SIZE,
+    transform: TransformListFunc | None = None,
+    filename: str | None = None,
+    priority: Priority = Priority.LOW,
+    max_concurrency: int | None = None,
+    statement_timeout: float | None = None,
+) -> Decorator:
+    """
+    Streams whole queryset as NDJSON or CSV
+    Queryset is read in id ordered batches, so each query stays within statement timeout
+    statement_timeout (seconds) overrides it for the view and batch queries if batches are still too slow
+    Admission slot is held only until the response starts streaming
+    """
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(func)
+        async def export_view(request: Any, *args: Any, **kwargs: Any) -> Any:
+            qset = await func(request, *args, **kwargs)
+            return export_response(
+                qset,
+                response_type,
+                export_format=export_format,
+                batch_size=batch_size,
+                transform=transform,
+                filename=filename,
+                statement_timeout=statement_timeout,
+            )
+        view = export_view
+        if statement_timeout is not None:
+            view = with_statement_timeout(view, statement_timeout)
+        router_decorator: Decorator = router.get(url, auth=auth)
+        return router_decorator(admitted(view, url, priority=priority, max_concurrency=max_concurrency))
+
+    return decorator
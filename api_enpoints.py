@@ -4,7 +4,10 @@ from django.http import HttpRequest, HttpResponse
 from django.conf import settings
 from django.contrib.auth import aauthenticate
 from django_utils.api import action
-from django_utils.auth import async_get_user
+from django_utils.admission import Priority
+from django_utils.permissions import aget_user_claims, PermissionRequirement
+from django_utils.revocation import is_token_revoked, revoke_token
+from django_utils.user_cache import aget_cached_user
 from django_utils.jwt import create_access_token, decode_jwt_token
 from django_utils.schema import (
     LoginRequestData, EmptyResponse, TranslationRequestData, TranslationResponseData
@@ -34,39 +37,44 @@ def set_access_token_cookie(response: HttpResponse, access_token: str):
     )
 
 
-@action(auth_router, url='/login', response_type=EmptyResponse, auth=None)
+@action(auth_router, url='/login', response_type=EmptyResponse, auth=None, priority=Priority.HIGH)
 async def login_endpoint(request: HttpRequest, data: Body[LoginRequestData], response: HttpResponse):
     user = await authenticate_user(request, data.username, data.password)
     
-    access_token = create_access_token(user.id, user.username)
+    access_token = create_access_token(user.id, user.username, claims=await aget_user_claims(user))
 
     set_access_token_cookie(response, access_token)
 
     return EmptyResponse()
 
 
-@action(auth_router, url='/logout', response_type=EmptyResponse)
+@action(auth_router, url='/logout', response_type=EmptyResponse, priority=Priority.HIGH)
 async def logout_endpoint(request: HttpRequest, response: HttpResponse):
     await request.session.aflush()
+    refresh_token = request.COOKIES.get(REFRESH_TOKEN_COOKIE_NAME)
+    if refresh_token:
+        payload = decode_jwt_token(refresh_token, expected_type="refresh")
+        if payload:
+            await revoke_token(payload) # type: ignore
+        response.delete_cookie(REFRESH_TOKEN_COOKIE_NAME)
     return EmptyResponse()
 
 
-@action(auth_router, url='/refresh_access_token', response_type=EmptyResponse, auth=None)
+@action(auth_router, url='/refresh_access_token', response_type=EmptyResponse, auth=None, priority=Priority.HIGH)
 async def refresh_access_token_endpoint(request: HttpRequest, response: HttpResponse):
     refresh_token = request.COOKIES.get(REFRESH_TOKEN_COOKIE_NAME)
     if not refresh_token:
         raise HttpError(401, "No refresh token")
 
     payload = decode_jwt_token(refresh_token, expected_type="refresh")
-    if not payload:
+    if not payload or await is_token_revoked(payload): # type: ignore
         raise HttpError(401, "Invalid or expired refresh token")
 
-    try:
-        user = User.objects.get(id=payload["user_id"])
-    except User.DoesNotExist:
+    user = await aget_cached_user(payload["user_id"])
+    if user is None or not user.is_active:
         raise HttpError(401, "User not found")
 
-    new_access_token = create_access_token(user.id, user.username)
+    new_access_token = create_access_token(user.id, user.username, claims=await aget_user_claims(user))
 
     set_access_token_cookie(response, new_access_token)
 
@@ -84,12 +92,11 @@ LOCALES_MAP = {
     'es': 'Испанский',
 }
 
-@action(translation_router, url='/get_translation', response_type=TranslationResponseData)
+@action(
+    translation_router, url='/get_translation', response_type=TranslationResponseData,
+    permission=PermissionRequirement(superuser=True),
+)
 async def get_translation(request: HttpRequest, data: Body[TranslationRequestData]):
-    user = await async_get_user(request)
-    if not user.is_superuser:
-        raise HttpError(403, 'Forbidden')
-
     language = LOCALES_MAP[data.locale]
     prompt = TRANSLATION_PROMPT_TEMPLATE.format(language=language, text=data.text)
     translation = await text_prompt(prompt, settings.OPENAI_API_KEY)
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.core import checks
+
+
+class DjangoUtilsConfig(AppConfig):
+    name = 'django_utils'
+
+    def ready(self) -> None:
+        # Checks are registered when the app is installed, not when modules using them are imported
+        from django_utils.cache_checks import check_shared_caches
+        from django_utils.pagination_checks import check_pagination_indexes
+        checks.register(check_shared_caches, checks.Tags.caches)
+        checks.register(check_pagination_indexes, checks.Tags.database)
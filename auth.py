@@ -7,12 +7,26 @@ from typing import Any
 from django_utils.schema import AuthData
 from django_utils.jwt import decode_jwt_token
 from django_utils.constants import ACCESS_TOKEN_COOKIE_NAME
+from django_utils.user_cache import aget_cached_user
+from django_utils.permissions import aget_auth_data_from_claims
+from django_utils.timing import timed
+
+AUTH_RESULTS_ATTR = '_auth_results'
+
 
 class UserNotAuthenticatedError(Exception):
     """Custom exception for unauthenticated user access."""
     pass
 
 
+def get_auth_results(request: HttpRequest) -> dict[tuple[Any, str | None], Any]:
+    """
+    Authentication results are stored on the request by auth instance and credentials
+    Batch sub-requests get a copy, so they reuse results of the batch request but not of each other
+    """
+    return request.__dict__.setdefault(AUTH_RESULTS_ATTR, {})
+
+
 def get_user_id_from_session(request: HttpRequest) -> int | None:
     user_pk = User._meta.pk # type: ignore
     if user_pk is None: # type: ignore
@@ -30,14 +44,28 @@ async def async_get_user(request: HttpRequest) -> User:
     user_id = get_user_id_from_request(request)
     if user_id is None:
         raise UserNotAuthenticatedError("User is not authenticated.")
-    return await User.objects.aget(pk=user_id)
+    user = await aget_cached_user(user_id)
+    if user is None:
+        raise User.DoesNotExist("User matching query does not exist.")
+    return user # type: ignore
 
 
 async def async_get_user_or_none(request: HttpRequest) -> User | None:
     user_id = get_user_id_from_request(request)
     if user_id is None:
         return None
-    return await User.objects.aget(pk=user_id)
+    user = await aget_cached_user(user_id)
+    if user is None:
+        raise User.DoesNotExist("User matching query does not exist.")
+    return user # type: ignore
+
+
+def is_session_only_auth() -> bool:
+    """
+    In session only mode AuthData is built from the session without loading the user,
+    deleted or deactivated users stay authenticated until their session expires
+    """
+    return getattr(settings, 'AUTH_SESSION_ONLY', False)
 
 
 class AsyncSessionAuth(APIKeyCookie):
@@ -45,15 +73,25 @@ class AsyncSessionAuth(APIKeyCookie):
     param_name: str = settings.SESSION_COOKIE_NAME
 
     async def get_auth_data(self, request_user: User, request: HttpRequest) -> Any:
-        return AuthData(user_id=request_user.id)
+        return AuthData(user_id=request_user.id, is_superuser=request_user.is_superuser, is_staff=request_user.is_staff)
 
 
     async def authenticate(self, request: HttpRequest, key: str | None) -> Any:
-        try:
-            user = await async_get_user(request)
-        except UserNotAuthenticatedError:
-            return None
-        return await self.get_auth_data(request_user=user, request=request)
+        auth_results = get_auth_results(request)
+        result_key = (self, key)
+        if result_key in auth_results:
+            return auth_results[result_key]
+        with timed('auth'):
+            if is_session_only_auth():
+                user_id = get_user_id_from_request(request)
+                auth_results[result_key] = None if user_id is None else AuthData(user_id=user_id)
+                return auth_results[result_key]
+            try:
+                user = await async_get_user(request)
+            except UserNotAuthenticatedError:
+                return None
+            auth_results[result_key] = await self.get_auth_data(request_user=user, request=request)
+        return auth_results[result_key]
 
 
 django_auth = AsyncSessionAuth()
@@ -62,13 +100,19 @@ django_auth = AsyncSessionAuth()
 class JwtAuth(APIKeyCookie):
     param_name: str = ACCESS_TOKEN_COOKIE_NAME
 
-    def authenticate(self, request: HttpRequest, key: str | None) -> Any:
+    async def authenticate(self, request: HttpRequest, key: str | None) -> Any:
         if key is None:
             return None
-        payload = decode_jwt_token(key, expected_type="access")
-        if payload is None:
-            return None
-        return AuthData(user_id=payload["user_id"])
+        auth_results = get_auth_results(request)
+        result_key = (self, key)
+        if result_key in auth_results:
+            return auth_results[result_key]
+        with timed('auth'):
+            payload = decode_jwt_token(key, expected_type="access")
+            if payload is None:
+                return None
+            auth_results[result_key] = await aget_auth_data_from_claims(payload) # type: ignore
+        return auth_results[result_key]
 
 
 jwt_auth = JwtAuth()
\ No newline at end of file
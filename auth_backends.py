@@ -1,15 +1,15 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
 from social_core.backends.yandex import YandexOAuth2
+from django_utils.user_cache import aget_cached_user
 
 UserModel = get_user_model()
 
 class AsyncModelBackend(ModelBackend):
 
     async def aget_user(self, user_id: int):
-        try:
-            user = await UserModel._default_manager.aget(pk=user_id)
-        except UserModel.DoesNotExist:
+        user = await aget_cached_user(user_id)
+        if user is None:
             return None
         return user if self.user_can_authenticate(user) else None
 
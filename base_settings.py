@@ -1,7 +1,7 @@
 
 import django_stubs_ext
 
-from django_utils.settings_helpers import config_get, config_get_str
+from django_utils.settings_helpers import config_get, config_get_str, config_pool_options, config_pool_autotune
 from typing import Any
 from copy import deepcopy
 import os
@@ -34,11 +34,17 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator'},
 ]
 
-POOL_OPTIONS: dict[str, int] = {
-    "min_size": 2,  # Minimum number of connections in the pool
-    "max_size": 4,  # Maximum number of connections in the pool
-    "timeout": 10,  # Timeout in seconds for acquiring a connection
-}
+# DATABASE_POOL_MIN_SIZE, DATABASE_POOL_MAX_SIZE, DATABASE_POOL_TIMEOUT (seconds to acquire a connection),
+# DATABASE_POOL_MAX_LIFETIME and DATABASE_POOL_MAX_IDLE (seconds) environment vars
+POOL_OPTIONS: dict[str, Any] = config_pool_options(min_size=2, max_size=4, timeout=10)
+
+# Adjusts or recommends pool max_size by observed acquire wait, see django_utils.db_pool
+POOL_AUTOTUNE: dict[str, Any] = config_pool_autotune(POOL_OPTIONS["max_size"])
+
+# Global admission control is disabled by default, per endpoint max_concurrency works without it
+# With it requests above concurrency wait in a bounded priority queue, shed with 503 when it is full or timeout passes
+# ADMISSION_CONTROL = {"concurrency": POOL_OPTIONS["max_size"] * 2, "max_queue": 50, "timeout": 2}
+ADMISSION_CONTROL: dict[str, Any] | None = None
 
 if 'migrate' in sys.argv:
     db_options = {}
@@ -56,17 +62,37 @@ DATABASES: dict[str, Any] = {
         "HOST": config_get_str('DATABASE_HOST', default=f'{PROJECT_NAME}-postgres'),
         "PORT": config_get_str('DATABASE_PORT', default='5432'),
         "PASSWORD": config_get_str('DATABASE_PASSWORD', default=PROJECT_NAME),
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "django_utils.db_backend",
         "OPTIONS": db_options
     }
 }
 
+# Comma separated hosts of read replicas, typed reads of api views go to them, see django_utils.db_router
+# In tests replicas mirror the default database
+replica_hosts_str = config_get_str('DATABASE_REPLICA_HOSTS', default='')
+DATABASE_REPLICAS: list[str] = []
+for replica_index, replica_host in enumerate(filter(None, replica_hosts_str.split(','))):
+    replica_alias = f'replica_{replica_index}'
+    DATABASES[replica_alias] = {
+        **deepcopy(DATABASES['default']),
+        "HOST": replica_host,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(replica_alias)
+
+DATABASE_ROUTERS = ['django_utils.db_router.ReplicaRouter']
+# Reads of the client stay on the primary for this many seconds after a write
+REPLICA_PIN_SECONDS = 5
+
 AUTHENTICATION_BACKENDS = (
     'django_utils.auth_backends.AsyncModelBackend',
 )
 
 MIDDLEWARE = [
+    'django_utils.timing.TimingMiddleware',
+    'django_utils.db_router.ReplicaPinMiddleware',
     'django_utils.middleware.DomainRoutingMiddleware',
+    'django_utils.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -178,6 +204,16 @@ SITE_URL = f'https://{PROJECT_DOMAIN}'
 SENTRY_FRONTEND_DSN = config_get('SENTRY_FRONTEND_DSN', default=None)
 
 SENTRY_DSN = config_get('SENTRY_DSN', default=None)
+
+# Server-Timing header is returned only to staff users
+SERVER_TIMING = 'staff'
+
+# Share of requests checked for query budget and suspected N+1, set QUERY_BUDGET_RAISE = True in test settings
+QUERY_BUDGET_SAMPLE_RATE = 0.01
+
+# Queries slower than threshold (seconds) and cancelled ones are kept for the staff slow_queries endpoint
+SLOW_QUERY_THRESHOLD = 0.2
+SLOW_QUERY_EXPLAIN_RATE = 0.1
 if SENTRY_DSN is not None:
     sentry_sdk.init(
         dsn=str(SENTRY_DSN),
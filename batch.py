@@ -0,0 +1,131 @@
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import urlencode
+from ninja import Router, Body
+from ninja.errors import HttpError
+from django.conf import settings
+from django.http import HttpRequest, HttpResponseBase, QueryDict, Http404
+from django.urls import ResolverMatch, resolve
+from asgiref.sync import sync_to_async
+from django_utils.api import action
+from django_utils.auth import AUTH_RESULTS_ATTR, get_auth_results
+import asyncio
+import copy
+import inspect
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_MAX_SIZE = 20
+DEFAULT_BATCH_CONCURRENCY = 4
+# URL names of ninja views that are not operations (docs, schema, root)
+NINJA_SERVICE_URL_NAMES = ('api-root', 'openapi-json', 'openapi-view')
+
+batch_router = Router()
+
+
+@dataclass(kw_only=True, slots=True, frozen=True)
+class BatchRequestItem:
+    path: str
+    method: str = 'GET'
+    query: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass(kw_only=True, slots=True, frozen=True)
+class BatchRequestData:
+    requests: list[BatchRequestItem]
+
+
+@dataclass(kw_only=True, slots=True, frozen=True)
+class BatchResponseItem:
+    status: int
+    body: Any = None
+
+
+@dataclass(kw_only=True, slots=True, frozen=True)
+class BatchResponse:
+    responses: list[BatchResponseItem]
+
+
+def make_subrequest(request: HttpRequest, item: BatchRequestItem) -> HttpRequest:
+    """
+    Sub-request is a shallow copy of the batch request, so it shares session and cookies
+    Auth results of the batch request are copied, sub-requests don't write to the shared dict
+    """
+    query_string = urlencode(item.query)
+    subrequest = copy.copy(request)
+    subrequest.__dict__[AUTH_RESULTS_ATTR] = dict(get_auth_results(request))
+    subrequest.method = 'GET'
+    subrequest.path = item.path
+    subrequest.path_info = item.path
+    subrequest.GET = QueryDict(query_string)
+    subrequest.META = {
+        **request.META,
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': item.path,
+        'QUERY_STRING': query_string,
+    }
+    return subrequest
+
+
+def get_response_body(response: HttpResponseBase) -> Any:
+    content = getattr(response, 'content', b'')
+    if len(content) == 0:
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(content)
+    return content.decode(response.charset)
+
+
+def is_api_operation(request: HttpRequest, match: ResolverMatch) -> bool:
+    """
+    Operation of the same NinjaAPI as the batch endpoint, other views don't expect sub-requests
+    """
+    batch_match = getattr(request, 'resolver_match', None)
+    if batch_match is None or 'ninja' not in match.app_names:
+        return False
+    return match.namespace == batch_match.namespace and match.url_name not in NINJA_SERVICE_URL_NAMES
+
+
+async def execute_item(request: HttpRequest, item: BatchRequestItem) -> BatchResponseItem:
+    if item.method.upper() != 'GET':
+        return BatchResponseItem(status=405, body={'detail': 'Only GET requests can be batched'})
+    try:
+        match = resolve(item.path, urlconf=getattr(request, 'urlconf', None))
+    except Http404:
+        return BatchResponseItem(status=404, body={'detail': 'Not found'})
+    if not is_api_operation(request, match):
+        return BatchResponseItem(status=404, body={'detail': 'Not found'})
+    subrequest = make_subrequest(request, item)
+    try:
+        if inspect.iscoroutinefunction(match.func):
+            response = await match.func(subrequest, *match.args, **match.kwargs)
+        else:
+            response = await sync_to_async(match.func)(subrequest, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception('Batch sub-request %s failed', item.path)
+        return BatchResponseItem(status=500, body={'detail': 'Internal server error'})
+    if response.streaming:
+        return BatchResponseItem(status=400, body={'detail': 'Streaming responses can not be batched'})
+    return BatchResponseItem(status=response.status_code, body=get_response_body(response))
+
+
+# Batch holds no admission slot, every sub-request is admitted by its own endpoint
+@action(batch_router, url='/batch', response_type=BatchResponse, priority=None)
+async def batch_endpoint(request: HttpRequest, data: Body[BatchRequestData]):
+    """
+    Executes several GET requests in one round trip, concurrently and in-process
+    Each item has its own status, failure of one item doesn't affect others
+    """
+    max_size = getattr(settings, 'BATCH_MAX_SIZE', DEFAULT_BATCH_MAX_SIZE)
+    if len(data.requests) > max_size:
+        raise HttpError(400, f'Batch can contain at most {max_size} requests')
+    semaphore = asyncio.Semaphore(getattr(settings, 'BATCH_CONCURRENCY', DEFAULT_BATCH_CONCURRENCY))
+
+    async def run(item: BatchRequestItem) -> BatchResponseItem:
+        async with semaphore:
+            return await execute_item(request, item)
+
+    responses = await asyncio.gather(*[run(item) for item in data.requests])
+    return BatchResponse(responses=list(responses))
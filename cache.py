@@ -0,0 +1,167 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+from django.db import models
+import asyncio
+import hashlib
+import threading
+import time
+import weakref
+
+
+class TTLCache[V]:
+    """
+    Small in-process LRU cache with per entry expiration
+    Entries older than ttl are considered stale and are kept for stale_ttl seconds more,
+    so callers can serve them while value is being refreshed
+    """
+    def __init__(self, ttl: float, max_size: int = 1024, stale_ttl: float = 0) -> None:
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self._data: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_entry(self, key: Hashable) -> tuple[V, bool] | None:
+        """
+        Returns value and freshness flag, None if there is no usable entry
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if now > expires_at + self.stale_ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+        return value, now <= expires_at
+
+    def get(self, key: Hashable) -> V | None:
+        entry = self.get_entry(key)
+        if entry is None or not entry[1]:
+            return None
+        return entry[0]
+
+    def set(self, key: Hashable, value: V, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight[V]:
+    """
+    Collapses concurrent calls with the same key into one execution
+    All callers receive the result (or the exception) of the first call
+    The call runs in a task owned by the flight, cancelled callers (including the first one) don't cancel it
+    """
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Task[V]] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def forget(self, key: Hashable) -> asyncio.Task[V] | None:
+        """
+        Following calls start a new execution, callers already waiting still get the result of the forgotten one
+        """
+        return self._calls.pop(key, None)
+
+    def _done(self, key: Hashable, task: asyncio.Task[V]) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception() # Mark as retrieved to avoid warning when all callers were cancelled
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[V]]) -> V:
+        task = self._calls.get(key)
+        if task is None:
+            async def call() -> V:
+                return await func()
+            task = asyncio.get_running_loop().create_task(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._done(key, done))
+        # Shield so cancelled caller does not cancel the shared call
+        return await asyncio.shield(task)
+
+
+class AsyncCache[V]:
+    """
+    TTL cache with single-flight loading and stale-while-revalidate
+    Stale entries are returned immediately and refreshed in background
+    """
+    def __init__(self, ttl: float, stale_ttl: float = 0, max_size: int = 1024) -> None:
+        self.cache = TTLCache[V](ttl=ttl, stale_ttl=stale_ttl, max_size=max_size)
+        self.flight = SingleFlight[V]()
+        self._background: set[asyncio.Task[Any]] = set()
+        # Loads started before invalidation, their values may be outdated and are not cached
+        self._invalidated: weakref.WeakSet[asyncio.Task[Any]] = weakref.WeakSet()
+
+    async def _load(self, key: Hashable, fetch: Callable[[], Awaitable[V]]) -> V:
+        async def load() -> V:
+            value = await fetch()
+            if not self.is_load_invalidated():
+                self.cache.set(key, value)
+            return value
+        return await self.flight.do(key, load)
+
+    def is_load_invalidated(self) -> bool:
+        """
+        True inside of fetch function if the key was invalidated while it was running
+        """
+        task = asyncio.current_task()
+        return task is not None and task in self._invalidated
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Deletes the entry and forgets the load in flight, so it can't store the value read before the change
+        """
+        self.cache.delete(key)
+        task = self.flight.forget(key)
+        if task is not None:
+            self._invalidated.add(task)
+
+    def _refresh(self, key: Hashable, fetch: Callable[[], Awaitable[V]]) -> None:
+        if self.flight.in_flight(key):
+            return
+        task = asyncio.create_task(self._load(key, fetch))
+        self._background.add(task)
+        task.add_done_callback(self._on_refresh_done)
+
+    def _on_refresh_done(self, task: asyncio.Task[Any]) -> None:
+        self._background.discard(task)
+        if not task.cancelled():
+            # Failed refresh keeps serving stale value until it expires
+            task.exception()
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[V]]) -> V:
+        entry = self.cache.get_entry(key)
+        if entry is not None:
+            value, fresh = entry
+            if not fresh:
+                self._refresh(key, fetch)
+            return value
+        return await self._load(key, fetch)
+
+
+def queryset_cache_key(qset: models.QuerySet[Any]) -> str:
+    """
+    Signature of the queryset based on generated SQL and its params
+    Querysets with identical filters produce identical keys
+    """
+    sql, params = qset.query.sql_with_params()
+    return hashlib.sha1(repr((qset.db, sql, params)).encode('utf-8')).hexdigest()
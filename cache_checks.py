@@ -0,0 +1,51 @@
+from typing import Any, Sequence
+from django.conf import settings
+from django.core import checks
+from django_utils.middleware import DEFAULT_USER_DATA_CACHE_TTL
+from django_utils.user_cache import get_user_cache_options
+
+# Backends that are not shared between processes, versions bumped in one process are not seen by others
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+JWT_SESSION_MIDDLEWARE = 'django_utils.middleware.JwtSessionMiddleware'
+
+
+def get_shared_cache_aliases() -> list[tuple[str, str, bool]]:
+    """
+    (setting, cache alias, enabled) for features that invalidate through django cache
+    enabled is True only for features turned on in settings, permissions version is always used by claims
+    """
+    aliases = [('PERMISSIONS_CACHE', getattr(settings, 'PERMISSIONS_CACHE', 'default'), False)]
+    user_data_ttl = getattr(settings, 'USER_DATA_COOKIE_CACHE_TTL', DEFAULT_USER_DATA_CACHE_TTL)
+    if JWT_SESSION_MIDDLEWARE in settings.MIDDLEWARE and user_data_ttl is not None:
+        aliases.append(('USER_DATA_VERSION_CACHE', getattr(settings, 'USER_DATA_VERSION_CACHE', 'default'), True))
+    user_cache_backend = get_user_cache_options().get('backend')
+    if user_cache_backend is not None:
+        aliases.append(('USER_CACHE backend', user_cache_backend, True))
+    return aliases
+
+
+def is_process_local_cache(alias: str) -> bool:
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    return backend is None or backend in PROCESS_LOCAL_CACHE_BACKENDS
+
+
+def check_shared_caches(app_configs: Any = None, **kwargs: Any) -> Sequence[checks.CheckMessage]:
+    """
+    Registered by DjangoUtilsConfig
+    Process-local cache is an error only for features turned on in settings and without DEBUG,
+    otherwise it is a warning, single process deployments work with it
+    """
+    messages: list[checks.CheckMessage] = []
+    for setting, alias, enabled in get_shared_cache_aliases():
+        if not is_process_local_cache(alias):
+            continue
+        message = f'{setting} uses process-local cache "{alias}", invalidation is not visible to other processes'
+        hint = 'Configure shared cache backend (e.g. Redis or Memcached) in CACHES'
+        if enabled and not settings.DEBUG:
+            messages.append(checks.Error(message, hint=hint, id='django_utils.E001'))
+        else:
+            messages.append(checks.Warning(message, hint=hint, id='django_utils.W003'))
+    return messages
@@ -1,7 +1,15 @@
 from openai import AsyncOpenAI
 from enum import StrEnum
 from io import BytesIO
+from typing import Any
+from django_utils.metrics import Counter, Histogram
 import base64
+import time
+
+gpt_request_seconds = Histogram(
+    'gpt_request_seconds', 'OpenAI request latency', buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120), labelnames=('function', 'model')
+)
+gpt_tokens = Counter('gpt_tokens', 'Tokens used by OpenAI requests', labelnames=('function', 'model', 'kind'))
 
 class GptModel(StrEnum):
     GPT_4O_MINI = "gpt-4o-mini"
@@ -10,6 +18,15 @@ class GptModel(StrEnum):
     GPT_IMAGE = "gpt-image-1"
 
 
+def record_usage(function: str, model: str, started: float, response: Any) -> None:
+    gpt_request_seconds.labels(function, model).observe(time.perf_counter() - started)
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return
+    gpt_tokens.labels(function, model, 'input').inc(getattr(usage, 'prompt_tokens', None) or getattr(usage, 'input_tokens', 0) or 0)
+    gpt_tokens.labels(function, model, 'output').inc(getattr(usage, 'completion_tokens', None) or getattr(usage, 'output_tokens', 0) or 0)
+
+
 def get_base64_image(image_data: bytes) -> str:
     return f"data:image/jpeg;base64,{base64.b64encode(image_data).decode('utf-8')}"
 
@@ -20,6 +37,7 @@ async def analyze_image(
 ) -> str | None:
 
     client = AsyncOpenAI(api_key=api_key)
+    started = time.perf_counter()
     response = await client.chat.completions.create(
         model=model,
         messages=[
@@ -27,6 +45,7 @@ async def analyze_image(
             {"role": "user", "content": [{"type": "image_url", "image_url": {"url": get_base64_image(image_data)}}]}
         ]
     )
+    record_usage('analyze_image', model, started, response)
     return response.choices[0].message.content
 
 
@@ -35,12 +54,14 @@ async def text_prompt(
     model: GptModel = GptModel.GPT_4O_MINI
 ) -> str | None:
     client = AsyncOpenAI(api_key=api_key)
+    started = time.perf_counter()
     response = await client.chat.completions.create(
         model=model,
         messages=[
             {"role": "user", "content": prompt}
         ]
     )
+    record_usage('text_prompt', model, started, response)
     return response.choices[0].message.content
 
 
@@ -63,11 +84,13 @@ async def generate_image(
     Returns the URL of the generated image.
     """
     client = AsyncOpenAI(api_key=api_key)
+    started = time.perf_counter()
     response = await client.images.generate(
         model=model,
         prompt=prompt,
         size=size.value,
     )
+    record_usage('generate_image', model, started, response)
     if not response or not response.data or not response.data[0].b64_json:
         return None
     
@@ -0,0 +1,106 @@
+from typing import Any, Callable, Hashable
+from django.http import HttpRequest, HttpResponse, HttpResponseBase
+from django_utils.cache import SingleFlight, TTLCache
+from django_utils.db_router import is_pinned_to_primary
+from django_utils.schema import AuthData
+from django_utils.view_helpers import wrap_view, ViewCall
+
+DEFAULT_COALESCE_MAX_SIZE = 1024
+# Headers describing the shared content, cookies and other headers of the leader belong to its client only
+SHARED_HEADERS = frozenset((
+    'content-type', 'content-language', 'content-disposition', 'etag', 'last-modified', 'cache-control', 'expires', 'vary',
+))
+
+SharedResult = tuple[Any, HttpResponse]
+
+
+def get_auth_scope(request: HttpRequest) -> str | None:
+    """
+    Requests are shared only inside the same scope, None if scope can't be determined
+    """
+    auth = getattr(request, 'auth', None)
+    if auth is None:
+        return 'public'
+    if isinstance(auth, AuthData):
+        return f'user:{auth.user_id}'
+    return None
+
+
+def get_coalesce_key(request: HttpRequest) -> Hashable | None:
+    scope = get_auth_scope(request)
+    # Shared result may come from a replica, client pinned after a write must read its own writes
+    if scope is None or is_pinned_to_primary():
+        return None
+    return (
+        getattr(request, 'urlconf', None),
+        request.path,
+        tuple(sorted((key, tuple(values)) for key, values in request.GET.lists())),
+        scope,
+        request.headers.get('If-None-Match'),
+        request.headers.get('If-Modified-Since'),
+    )
+
+
+def copy_shared_headers(response: HttpResponseBase, leader_response: HttpResponseBase) -> None:
+    response.status_code = leader_response.status_code
+    for key, value in leader_response.items():
+        if key.lower() in SHARED_HEADERS:
+            response[key] = value
+
+
+def clone_response(response: HttpResponse, leader: bool) -> HttpResponse:
+    clone = HttpResponse(response.content, status=response.status_code)
+    if not leader:
+        copy_shared_headers(clone, response)
+        return clone
+    for key, value in response.items():
+        clone[key] = value
+    for name, cookie in response.cookies.items():
+        clone.cookies[name] = cookie
+    return clone
+
+
+def is_shareable(result: Any) -> bool:
+    if isinstance(result, HttpResponseBase):
+        return isinstance(result, HttpResponse) and not result.streaming
+    return True
+
+
+def coalesced(func: Callable[..., Any], ttl: float = 0) -> Callable[..., Any]:
+    """
+    Concurrent identical GET requests (same path, query, auth scope and validators) share one execution
+    Completed result is reused for ttl seconds more, so ttl should stay in the range of milliseconds
+    Responses written by fast_json are shared as bytes, other results are serialized by ninja for each request
+    Followers get only content and validator headers of the leader, never its cookies
+    """
+    flight = SingleFlight[SharedResult]()
+    recent = TTLCache[SharedResult](ttl=ttl, max_size=DEFAULT_COALESCE_MAX_SIZE)
+
+    async def handler(call: ViewCall, request: HttpRequest, response: HttpResponse) -> Any:
+        key = get_coalesce_key(request)
+        if key is None:
+            return await call()
+        shared = recent.get(key) if ttl > 0 else None
+        leader = False
+        if shared is None:
+            async def execute() -> SharedResult:
+                nonlocal leader
+                leader = True
+                result = await call()
+                if ttl > 0 and is_shareable(result):
+                    recent.set(key, (result, response))
+                return result, response
+
+            shared = await flight.do(key, execute)
+        result, leader_response = shared
+        if not is_shareable(result):
+            # Streaming responses can be consumed only once
+            return result if leader else await call()
+        if not leader:
+            copy_shared_headers(response, leader_response)
+        if isinstance(result, HttpResponse):
+            # Shared response is never returned itself, middlewares may modify it
+            return clone_response(result, leader)
+        return result
+
+    return wrap_view(func, handler)
@@ -0,0 +1,115 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable
+from django.conf import settings
+from django.db import models
+from django.http import HttpRequest, HttpResponse, HttpResponseBase, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django_utils.view_helpers import wrap_view, ViewCall
+import hashlib
+
+DEFAULT_CACHE_CONTROL = 'private, no-cache'
+
+CONDITIONAL_OPTIONS_ATTR = '_conditional_options'
+CONDITIONAL_VALIDATOR_ATTR = '_conditional_validator'
+
+
+@dataclass(kw_only=True, slots=True, frozen=True)
+class ConditionalOptions:
+    field: str
+    cache_control: str
+
+
+@dataclass(kw_only=True, slots=True, frozen=True)
+class Validator:
+    etag: str
+    last_modified: datetime | None
+
+
+class NotModified(Exception):
+    def __init__(self, validator: Validator) -> None:
+        self.validator = validator
+        super().__init__('Not modified')
+
+
+async def get_queryset_validator(qset: models.QuerySet[Any], field: str, salt: str = '') -> Validator:
+    """
+    Cheap validator based only on (id, field) pairs and the number of the rows, it doesn't decode anything
+    Salt should change when representation of the rows changes
+    Last-Modified is set only for a single row, max(field) of a list doesn't change when rows are deleted
+    """
+    rows = [row async for row in qset.values_list('id', field)]
+    digest = hashlib.sha1(repr((salt, len(rows), rows)).encode('utf-8')).hexdigest()
+    last_modified = rows[0][1] if len(rows) == 1 else None
+    return Validator(etag=f'W/"{digest}"', last_modified=last_modified)
+
+
+def is_not_modified(request: HttpRequest, validator: Validator) -> bool:
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or validator.etag in etags
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since'))
+    if if_modified_since is not None and validator.last_modified is not None:
+        return int(validator.last_modified.timestamp()) <= if_modified_since
+    return False
+
+
+async def get_validator(request: HttpRequest | None, qset: models.QuerySet[Any], salt: str = '') -> Validator | None:
+    """
+    None if conditional responses are not enabled for the view
+    """
+    options: ConditionalOptions | None = getattr(request, CONDITIONAL_OPTIONS_ATTR, None)
+    if options is None:
+        return None
+    salt = f'{getattr(settings, "VERSION", "")}:{salt}'
+    return await get_queryset_validator(qset, options.field, salt=salt)
+
+
+def apply_validator(request: HttpRequest | None, validator: Validator | None) -> None:
+    """
+    Raises NotModified if client has current data, validator can be computed by another request, e.g. cached one
+    """
+    if request is None or validator is None:
+        return
+    setattr(request, CONDITIONAL_VALIDATOR_ATTR, validator)
+    if is_not_modified(request, validator):
+        raise NotModified(validator)
+
+
+async def check_not_modified(request: HttpRequest | None, qset: models.QuerySet[Any], salt: str = '') -> None:
+    """
+    Raises NotModified if conditional responses are enabled for the view and client has current data
+    Should be called with the exact queryset that produces the response, before decoding it
+    """
+    apply_validator(request, await get_validator(request, qset, salt=salt))
+
+
+def set_validator_headers(response: HttpResponseBase, validator: Validator, cache_control: str) -> None:
+    response['ETag'] = validator.etag
+    if validator.last_modified is not None:
+        response['Last-Modified'] = http_date(validator.last_modified.timestamp())
+    response['Cache-Control'] = cache_control
+
+
+def conditional(func: Callable[..., Any], field: str, cache_control: str = DEFAULT_CACHE_CONTROL) -> Callable[..., Any]:
+    """
+    Enables ETag/Last-Modified validation for the view
+    Validator itself is computed by paginators and get_single_item_or_404 from the queryset
+    """
+    options = ConditionalOptions(field=field, cache_control=cache_control)
+
+    async def handler(call: ViewCall, request: HttpRequest, response: HttpResponse) -> Any:
+        setattr(request, CONDITIONAL_OPTIONS_ATTR, options)
+        try:
+            result = await call()
+        except NotModified as e:
+            not_modified = HttpResponseNotModified()
+            set_validator_headers(not_modified, e.validator, cache_control)
+            return not_modified
+        validator: Validator | None = getattr(request, CONDITIONAL_VALIDATOR_ATTR, None)
+        if validator is not None:
+            set_validator_headers(response, validator, cache_control)
+        return result
+
+    return wrap_view(func, handler)
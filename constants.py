@@ -1,2 +1,3 @@
 ACCESS_TOKEN_COOKIE_NAME = "access_token"
-REFRESH_TOKEN_COOKIE_NAME = "refresh_token"
\ No newline at end of file
+REFRESH_TOKEN_COOKIE_NAME = "refresh_token"
+REPLICA_PIN_COOKIE_NAME = "replica_pin"
\ No newline at end of file
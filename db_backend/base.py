@@ -0,0 +1,28 @@
+from typing import Any
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+from django_utils.db_pool import (
+    db_connection_acquire_seconds, db_connection_timeouts, is_pool_timeout, mark_connection_created, record_checkout
+)
+import time
+
+
+class DatabaseWrapper(PostgresDatabaseWrapper):
+    """
+    PostgreSQL backend with connection pool instrumentation and auto tuning
+    ENGINE = 'django_utils.db_backend'
+    """
+    def get_new_connection(self, conn_params: dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            connection = super().get_new_connection(conn_params)
+        except Exception as error:
+            if is_pool_timeout(error):
+                db_connection_timeouts.labels(self.alias).inc()
+                db_connection_acquire_seconds.labels(self.alias).observe(time.perf_counter() - started)
+            raise
+        record_checkout(self.alias, connection, time.perf_counter() - started)
+        return connection
+
+    def _configure_connection(self, connection: Any) -> Any:
+        mark_connection_created(connection)
+        return super()._configure_connection(connection)
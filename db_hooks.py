@@ -0,0 +1,64 @@
+from typing import Any, Callable
+from django.db import connections
+from django.db.backends.signals import connection_created
+import time
+
+QueryObserver = Callable[[str, float, int | None], None]
+# Django execute wrapper: execute, sql, params, many, context
+ExecuteWrapper = Callable[[Callable[..., Any], str, Any, bool, dict[str, Any]], Any]
+
+_observers: list[QueryObserver] = []
+
+
+def register_query_observer(observer: QueryObserver) -> None:
+    """
+    Observer receives sql, duration in seconds and number of rows (None if driver doesn't report it)
+    It is called from the thread executing the query
+    """
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def unregister_query_observer(observer: QueryObserver) -> None:
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def observe_query(execute: Callable[..., Any], sql: str, params: Any, many: bool, context: dict[str, Any]) -> Any:
+    if not _observers:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        rowcount = getattr(context.get('cursor'), 'rowcount', -1)
+        rows = rowcount if rowcount is not None and rowcount >= 0 else None
+        for observer in list(_observers):
+            observer(sql, duration, rows)
+
+
+_execute_wrappers: list[ExecuteWrapper] = [observe_query]
+
+
+def register_execute_wrapper(wrapper: ExecuteWrapper) -> None:
+    """
+    Installs wrapper on all connections, wrappers registered earlier are outer ones
+    """
+    if wrapper in _execute_wrappers:
+        return
+    _execute_wrappers.append(wrapper)
+    for connection in connections.all(initialized_only=True):
+        install_execute_wrappers(None, connection)
+
+
+def install_execute_wrappers(sender: Any, connection: Any, **kwargs: Any) -> None:
+    for wrapper in _execute_wrappers:
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+
+connection_created.connect(install_execute_wrappers, dispatch_uid='django_utils_query_observer')
+# Connections opened before import in the current thread, connections of other threads are not observed
+for existing_connection in connections.all(initialized_only=True):
+    install_execute_wrappers(None, existing_connection)
@@ -0,0 +1,207 @@
+from dataclasses import dataclass
+from typing import Any
+from django.conf import settings
+from django.db import connections
+from django_utils.metrics import REGISTRY, Counter, Gauge, Histogram
+import logging
+import threading
+import time
+
+try:
+    from psycopg_pool import PoolTimeout
+except ImportError:
+    PoolTimeout = None
+
+logger = logging.getLogger(__name__)
+
+AGE_BUCKETS = (10, 60, 300, 600, 1200, 1800, 3600, 7200)
+CREATED_AT_ATTR = '_django_utils_created_at'
+
+db_connection_acquire_seconds = Histogram(
+    'db_connection_acquire_seconds', 'Time to get a connection from the pool', labelnames=('database',)
+)
+db_connection_timeouts = Counter(
+    'db_connection_timeouts', 'Connection requests that timed out waiting for the pool', labelnames=('database',)
+)
+db_connection_age_seconds = Histogram(
+    'db_connection_age_seconds', 'Age of pooled connections at checkout', buckets=AGE_BUCKETS, labelnames=('database',)
+)
+db_pool_connections = Gauge('db_pool_connections', 'Pool connections by state', labelnames=('database', 'state'))
+db_pool_max_size = Gauge('db_pool_max_size', 'Current max_size of the pool', labelnames=('database',))
+db_pool_recommended_max_size = Gauge(
+    'db_pool_recommended_max_size', 'Pool max_size recommended by auto tuning', labelnames=('database',)
+)
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class PoolStats:
+    """
+    Snapshot of psycopg pool, requests, queued, wait_seconds and timeouts are totals since the pool start
+    """
+    database: str
+    min_size: int
+    max_size: int
+    size: int
+    idle: int
+    in_use: int
+    waiting: int
+    requests: int
+    queued: int
+    wait_seconds: float
+    timeouts: int
+
+
+def get_pool(alias: str) -> Any | None:
+    """
+    Pool is created by Django on the first connection, stats never open it
+    """
+    return getattr(type(connections[alias]), '_connection_pools', {}).get(alias)
+
+
+def get_pooled_aliases() -> list[str]:
+    return [alias for alias, database in settings.DATABASES.items() if database.get('OPTIONS', {}).get('pool')]
+
+
+def get_pool_stats(alias: str) -> PoolStats | None:
+    pool = get_pool(alias)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    size = stats.get('pool_size', 0)
+    idle = stats.get('pool_available', 0)
+    return PoolStats(
+        database=alias,
+        min_size=stats.get('pool_min', pool.min_size),
+        max_size=stats.get('pool_max', pool.max_size),
+        size=size,
+        idle=idle,
+        in_use=size - idle,
+        waiting=stats.get('requests_waiting', 0),
+        requests=stats.get('requests_num', 0),
+        queued=stats.get('requests_queued', 0),
+        wait_seconds=stats.get('requests_wait_ms', 0) / 1000,
+        timeouts=stats.get('requests_errors', 0),
+    )
+
+
+def collect_pool_metrics() -> None:
+    for alias in get_pooled_aliases():
+        stats = get_pool_stats(alias)
+        if stats is None:
+            continue
+        db_pool_connections.labels(alias, 'in_use').set(stats.in_use)
+        db_pool_connections.labels(alias, 'idle').set(stats.idle)
+        db_pool_connections.labels(alias, 'waiting').set(stats.waiting)
+        db_pool_max_size.labels(alias).set(stats.max_size)
+
+
+REGISTRY.register_collector(collect_pool_metrics)
+
+
+def mark_connection_created(connection: Any) -> None:
+    """
+    Called from pool configure callback once per physical connection
+    """
+    if getattr(connection, CREATED_AT_ATTR, None) is None:
+        setattr(connection, CREATED_AT_ATTR, time.monotonic())
+
+
+def is_pool_timeout(error: BaseException) -> bool:
+    return PoolTimeout is not None and isinstance(error, PoolTimeout)
+
+
+class PoolTuner:
+    """
+    Compares pool totals between intervals
+    Timeouts or average acquire wait above wait_threshold grow max_size by one,
+    interval without queued requests and with idle connections shrinks it by one,
+    max_size stays within min_max_size and max_max_size
+    In recommend mode new size is only logged and exposed as db_pool_recommended_max_size,
+    in adjust mode the pool of the current process is resized
+    Each step starts from the previous recommendation, so recommend mode converges like adjust mode
+    """
+    def __init__(
+        self, alias: str, *, mode: str, min_max_size: int, max_max_size: int, wait_threshold: float, interval: float
+    ) -> None:
+        self.alias = alias
+        self.mode = mode
+        self.min_max_size = min_max_size
+        self.max_max_size = max_max_size
+        self.wait_threshold = wait_threshold
+        self.interval = interval
+        self.checked_at = time.monotonic()
+        self.last: PoolStats | None = None
+        self.recommended: int | None = None
+        self._lock = threading.Lock()
+
+    def recommend(self, previous: PoolStats, current: PoolStats) -> int:
+        requests = current.requests - previous.requests
+        waited = current.wait_seconds - previous.wait_seconds
+        average_wait = waited / requests if requests > 0 else 0
+        size = current.max_size if self.recommended is None else self.recommended
+        if current.timeouts > previous.timeouts or average_wait > self.wait_threshold:
+            size += 1
+        elif current.queued == previous.queued and current.idle > 1:
+            size -= 1
+        return min(max(size, self.min_max_size, current.min_size, 1), self.max_max_size)
+
+    def maybe_tune(self) -> None:
+        if time.monotonic() - self.checked_at < self.interval or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self.checked_at = time.monotonic()
+            self.tune()
+        finally:
+            self._lock.release()
+
+    def tune(self) -> None:
+        stats = get_pool_stats(self.alias)
+        if stats is None:
+            return
+        previous, self.last = self.last, stats
+        if previous is None:
+            return
+        size = self.recommend(previous, stats)
+        db_pool_recommended_max_size.labels(self.alias).set(size)
+        last_size = stats.max_size if self.recommended is None else self.recommended
+        self.recommended = size
+        if size == last_size:
+            return
+        logger.info('Pool %s max_size %s, recommended %s', self.alias, stats.max_size, size)
+        pool = get_pool(self.alias)
+        if self.mode == 'adjust' and pool is not None:
+            pool.resize(stats.min_size, size)
+
+
+_tuners: dict[str, PoolTuner | None] = {}
+
+
+def get_pool_tuner(alias: str) -> PoolTuner | None:
+    """
+    POOL_AUTOTUNE setting: mode (off, recommend, adjust), min_max_size, max_max_size, wait_threshold and interval
+    """
+    if alias not in _tuners:
+        options: dict[str, Any] = getattr(settings, 'POOL_AUTOTUNE', {})
+        mode = options.get('mode', 'off')
+        tuner = None
+        if mode != 'off':
+            tuner = PoolTuner(
+                alias,
+                mode=mode,
+                min_max_size=options['min_max_size'],
+                max_max_size=options['max_max_size'],
+                wait_threshold=options.get('wait_threshold', 0.005),
+                interval=options.get('interval', 60),
+            )
+        _tuners[alias] = tuner
+    return _tuners[alias]
+
+
+def record_checkout(alias: str, connection: Any, wait: float) -> None:
+    db_connection_acquire_seconds.labels(alias).observe(wait)
+    created_at = getattr(connection, CREATED_AT_ATTR, None)
+    if created_at is not None:
+        db_connection_age_seconds.labels(alias).observe(time.monotonic() - created_at)
+    tuner = get_pool_tuner(alias)
+    if tuner is not None:
+        tuner.maybe_tune()
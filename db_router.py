@@ -0,0 +1,150 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.http.response import HttpResponseBase
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django_utils.constants import REPLICA_PIN_COOKIE_NAME
+from django_utils.view_helpers import wrap_view, ViewCall
+import random
+import time
+
+DEFAULT_REPLICA_PIN_SECONDS = 5
+
+
+@dataclass(slots=True)
+class ReplicaPin:
+    """
+    Reads go to the primary if client wrote recently (pinned) or during the current scope (wrote)
+    """
+    pinned: bool = False
+    wrote: bool = False
+
+    @property
+    def primary_only(self) -> bool:
+        return self.pinned or self.wrote
+
+
+replica_reads_enabled: ContextVar[bool] = ContextVar('django_utils_replica_reads', default=False)
+current_pin: ContextVar[ReplicaPin | None] = ContextVar('django_utils_replica_pin', default=None)
+
+
+def get_replica_aliases() -> list[str]:
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def is_pinned_to_primary() -> bool:
+    """
+    Client wrote recently or during the current request, shared results may be read from a stale replica
+    """
+    pin = current_pin.get()
+    return pin is not None and pin.primary_only
+
+
+@contextmanager
+def replica_reads() -> Iterator[None]:
+    """
+    Reads in the block may go to a replica, e.g. typed_data_list outside of api views
+    Writes in the block pin the following reads to the primary
+    """
+    enabled_token = replica_reads_enabled.set(True)
+    pin_token = current_pin.set(ReplicaPin()) if current_pin.get() is None else None
+    try:
+        yield
+    finally:
+        if pin_token is not None:
+            current_pin.reset(pin_token)
+        replica_reads_enabled.reset(enabled_token)
+
+
+def with_replica_reads(func: Callable[..., Any]) -> Callable[..., Any]:
+    async def handler(call: ViewCall, request: HttpRequest, response: HttpResponse) -> Any:
+        with replica_reads():
+            return await call()
+
+    return wrap_view(func, handler)
+
+
+class ReplicaRouter:
+    """
+    DATABASE_ROUTERS = ['django_utils.db_router.ReplicaRouter']
+    Reads go to DATABASE_REPLICAS only inside replica_reads scope (read views of api helpers),
+    everything else including all writes uses the default database
+    """
+    def db_for_read(self, model: Any, **hints: Any) -> str | None:
+        replicas = get_replica_aliases()
+        if not replicas or not replica_reads_enabled.get() or is_pinned_to_primary():
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model: Any, **hints: Any) -> str | None:
+        pin = current_pin.get()
+        if pin is not None:
+            pin.wrote = True
+        return None
+
+    def allow_relation(self, obj1: Any, obj2: Any, **hints: Any) -> bool | None:
+        # Replicas have the same data as the primary
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, model_name: str | None = None, **hints: Any) -> bool | None:
+        return False if db in get_replica_aliases() else None
+
+
+class ReplicaPinMiddleware:
+    """
+    Read-your-writes: after a request that wrote to the database, reads of the client
+    are pinned to the primary for REPLICA_PIN_SECONDS by a cookie with the pin deadline
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.async_mode:
+            return self.__acall__(request)
+        pin = self.get_pin(request)
+        token = current_pin.set(pin)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_pin.reset(token)
+        return self.process_response(response, pin)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponseBase:
+        pin = self.get_pin(request)
+        token = current_pin.set(pin)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_pin.reset(token)
+        return self.process_response(response, pin)
+
+    def get_pin(self, request: HttpRequest) -> ReplicaPin:
+        try:
+            pinned_until = float(request.COOKIES.get(REPLICA_PIN_COOKIE_NAME, 0))
+        except ValueError:
+            pinned_until = 0
+        return ReplicaPin(pinned=pinned_until > time.time())
+
+    def process_response(self, response: HttpResponseBase, pin: ReplicaPin) -> HttpResponseBase:
+        if pin.wrote and get_replica_aliases():
+            pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', DEFAULT_REPLICA_PIN_SECONDS)
+            response.set_cookie(
+                REPLICA_PIN_COOKIE_NAME,
+                str(round(time.time() + pin_seconds, 3)),
+                max_age=pin_seconds,
+                domain=settings.SESSION_COOKIE_DOMAIN,
+                path=settings.SESSION_COOKIE_PATH,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,116 @@
+from collections.abc import Mapping, Sequence
+from dataclasses import fields, is_dataclass
+from enum import Enum
+from functools import cache
+from inspect import isclass
+from typing import Any, Annotated, Callable, get_args, get_origin, get_type_hints
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpRequest, HttpResponse, HttpResponseBase
+from django_utils.queries_helpers import remove_optional_from_type
+from django_utils.timing import timed
+from django_utils.view_helpers import wrap_view, ViewCall
+import json
+
+Encoder = Callable[[Any], Any]
+
+
+def identity(value: Any) -> Any:
+    return value
+
+
+def encode_enum(value: Enum) -> Any:
+    return value.value
+
+
+def get_dataclass_encoder(type_class: type) -> Encoder:
+    hints = get_type_hints(type_class, include_extras=True)
+    field_encoders = [
+        (field.name, get_encoder(hints.get(field.name, field.type)))
+        for field in fields(type_class)
+    ]
+    plain_fields = [name for name, encoder in field_encoders if encoder is identity]
+    nested_fields = [(name, encoder) for name, encoder in field_encoders if encoder is not identity]
+
+    def encode(obj: Any) -> Any:
+        result = {name: getattr(obj, name) for name in plain_fields}
+        for name, encoder in nested_fields:
+            value = getattr(obj, name)
+            result[name] = None if value is None else encoder(value)
+        return result
+
+    return encode
+
+
+@cache
+def get_encoder(type_hint: Any) -> Encoder:
+    """
+    Builds once per type a function converting trusted dataclass objects to JSON compatible data
+    Values left as is (datetime, Decimal, UUID) are handled by DjangoJSONEncoder, same as in ninja
+    """
+    type_hint = remove_optional_from_type(type_hint)
+    origin = get_origin(type_hint)
+    if origin is Annotated:
+        return get_encoder(get_args(type_hint)[0])
+    if is_dataclass(type_hint):
+        return get_dataclass_encoder(type_hint) # type: ignore
+    if isclass(origin) and issubclass(origin, Mapping):
+        args = get_args(type_hint)
+        value_encoder = get_encoder(args[1]) if len(args) == 2 else identity
+        if value_encoder is identity:
+            return identity
+        return lambda value: {k: None if v is None else value_encoder(v) for k, v in value.items()}
+    if isclass(origin) and issubclass(origin, Sequence):
+        args = get_args(type_hint)
+        item_encoder = get_encoder(args[0]) if len(args) > 0 else identity
+        if item_encoder is identity:
+            return list
+        return lambda value: [None if v is None else item_encoder(v) for v in value]
+    if isclass(type_hint) and issubclass(type_hint, Enum):
+        return encode_enum
+    return identity
+
+
+def encode_json(data: Any) -> bytes:
+    return json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8')
+
+
+def copy_temporal_response(response: HttpResponseBase, temporal_response: HttpResponse) -> None:
+    """
+    Transfers status, headers and cookies set by the view on the ninja temporal response
+    """
+    response.status_code = temporal_response.status_code
+    for key, value in temporal_response.items():
+        if key.lower() != 'content-type':
+            response[key] = value
+    for name, cookie in temporal_response.cookies.items():
+        response.cookies[name] = cookie
+
+
+def json_response(data: Any, temporal_response: HttpResponse) -> HttpResponse:
+    response = HttpResponse(encode_json(data), content_type='application/json; charset=utf-8')
+    copy_temporal_response(response, temporal_response)
+    return response
+
+
+def encode_page(result: dict[str, Any], item_encoder: Encoder, items_attribute: str = 'items') -> dict[str, Any]:
+    """
+    Pagination output is a plain dict with the list of items and cursor values
+    """
+    encoded = dict(result)
+    encoded[items_attribute] = [item_encoder(item) for item in result[items_attribute]]
+    return encoded
+
+
+def fast_json(func: Callable[..., Any], encoder: Encoder) -> Callable[..., Any]:
+    """
+    Writes view result straight to JSON bytes, skipping ninja response validation
+    Response schema registered in the router is still used for OpenAPI documentation
+    """
+    async def handler(call: ViewCall, request: HttpRequest, response: HttpResponse) -> Any:
+        result = await call()
+        if isinstance(result, HttpResponseBase):
+            return result
+        with timed('serialize'):
+            return json_response(encoder(result), response)
+
+    return wrap_view(func, handler)
@@ -0,0 +1,121 @@
+from contextlib import nullcontext
+from dataclasses import asdict
+from typing import Any, AsyncIterator, Literal, Sequence, Type
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.http import StreamingHttpResponse
+from django_utils.queries import typed_data_list
+from django_utils.schema import ModelProtocol, TransformListFunc
+from django_utils.slow_queries import statement_timeout as statement_timeout_scope
+from enum import Enum
+import csv
+import io
+import json
+
+
+ExportFormat = Literal['ndjson', 'csv']
+
+DEFAULT_EXPORT_BATCH_SIZE = 500
+
+CONTENT_TYPES: dict[ExportFormat, str] = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+async def iterate_batches(
+    qset: models.QuerySet[Any],
+    response_type: Type[ModelProtocol],
+    batch_size: int = DEFAULT_EXPORT_BATCH_SIZE,
+    transform: TransformListFunc | None = None,
+    statement_timeout: float | None = None,
+) -> AsyncIterator[Sequence[Any]]:
+    """
+    Walks queryset by id in keyset batches, so every query is small and fast
+    regardless of total number of rows
+    """
+    last_id: int | None = None
+    while True:
+        batch_qset = qset if last_id is None else qset.filter(id__gt=last_id)
+        batch_qset = batch_qset.order_by('id')[:batch_size]
+        # Timeout is set per batch, context can't be kept across yield of the generator
+        with statement_timeout_scope(statement_timeout) if statement_timeout is not None else nullcontext():
+            if transform is not None:
+                batch = await transform(batch_qset)
+            else:
+                batch = await typed_data_list(batch_qset, response_type)
+        if len(batch) == 0:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1].id
+
+
+def flatten_dict(data: dict[str, Any], prefix: str = '') -> dict[str, Any]:
+    """
+    Nested dictionaries are unfolded using Django double underscore notation
+    """
+    result: dict[str, Any] = {}
+    for key, value in data.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            result.update(flatten_dict(value, prefix=f'{name}__')) # type: ignore
+        else:
+            result[name] = value
+    return result
+
+
+def get_csv_value(value: Any) -> Any:
+    if value is None:
+        return ''
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (list, tuple)):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+async def ndjson_stream(batches: AsyncIterator[Sequence[Any]]) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        lines = [json.dumps(asdict(obj), cls=DjangoJSONEncoder) for obj in batch]
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+async def csv_stream(batches: AsyncIterator[Sequence[Any]]) -> AsyncIterator[bytes]:
+    header: list[str] | None = None
+    async for batch in batches:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for obj in batch:
+            row = flatten_dict(asdict(obj))
+            if header is None:
+                header = list(row.keys())
+                writer.writerow(header)
+            writer.writerow([get_csv_value(row.get(name)) for name in header])
+        yield buffer.getvalue().encode('utf-8')
+
+
+def export_response(
+    qset: models.QuerySet[Any],
+    response_type: Type[ModelProtocol],
+    export_format: ExportFormat = 'ndjson',
+    batch_size: int = DEFAULT_EXPORT_BATCH_SIZE,
+    transform: TransformListFunc | None = None,
+    filename: str | None = None,
+    statement_timeout: float | None = None,
+) -> StreamingHttpResponse:
+    """
+    Response is produced batch by batch while client reads it,
+    at most one decoded batch is kept in memory
+    """
+    batches = iterate_batches(
+        qset, response_type, batch_size=batch_size, transform=transform, statement_timeout=statement_timeout
+    )
+    stream = ndjson_stream(batches) if export_format == 'ndjson' else csv_stream(batches)
+    response = StreamingHttpResponse(stream, content_type=CONTENT_TYPES[export_format])
+    if filename is not None:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
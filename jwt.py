@@ -1,8 +1,29 @@
 from django.conf import settings
 from django.contrib.sessions.backends.base import SessionBase
-from typing import TypedDict, Any, Literal
+from django.core import signing
+from typing import TypedDict, Any, Callable, Literal, NotRequired
+from django_utils.cache import TTLCache
+from django_utils.metrics import Counter
 import jwt
+import copy
 import datetime
+import hashlib
+import json
+import time
+import uuid
+
+DEFAULT_TOKEN_CACHE_SIZE = 4096
+DEFAULT_TOKEN_CACHE_TTL = 300
+DEFAULT_INVALID_TOKEN_CACHE_TTL = 60
+# Browsers limit cookie to 4096 bytes including name and attributes
+DEFAULT_SESSION_MAX_SIZE = 3800
+COMPACT_SESSION_PREFIX = 'c1:'
+COMPACT_SESSION_SALT = 'django_utils.jwt.session'
+
+token_cache_hits = Counter('jwt_token_cache_hits', 'Tokens found in verified token cache')
+token_cache_misses = Counter('jwt_token_cache_misses', 'Tokens decoded and verified')
+
+_token_cache: TTLCache[dict[str, Any] | None] | None = None
 
 
 class JwtPayload(TypedDict):
@@ -10,10 +31,18 @@ class JwtPayload(TypedDict):
     username: str
     exp: datetime.datetime
     type: Literal["access"] | Literal["refresh"]
+    # Optional claims: superuser, staff, group names and permissions version
+    su: NotRequired[bool]
+    st: NotRequired[bool]
+    groups: NotRequired[list[str]]
+    pv: NotRequired[int]
+    # Refresh token id used for revocation
+    jti: NotRequired[str]
 
 
-def create_access_token(user_id: int, username: str) -> str:
+def create_access_token(user_id: int, username: str, claims: dict[str, Any] | None = None) -> str:
     payload: dict[str, Any] = {
+        **(claims or {}),
         "user_id": user_id,
         "username": username,
         "exp": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=settings.JWT_ACCESS_EXP_DELTA_SECONDS),
@@ -28,38 +57,113 @@ def create_refresh_token(user_id: int) -> str:
     payload: dict[str, Any] = {
         "user_id": user_id,
         "exp": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=settings.JWT_REFRESH_EXP_DELTA_SECONDS),
-        "type": "refresh"
+        "type": "refresh",
+        "jti": uuid.uuid4().hex,
     }
     token = jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
     return token
 
 
-def decode_jwt_token(token: str, expected_type: Literal["access"] | Literal["refresh"]) -> JwtPayload | None:
+def get_token_cache() -> TTLCache[dict[str, Any] | None]:
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = TTLCache(
+            ttl=getattr(settings, 'JWT_TOKEN_CACHE_TTL', DEFAULT_TOKEN_CACHE_TTL),
+            max_size=getattr(settings, 'JWT_TOKEN_CACHE_SIZE', DEFAULT_TOKEN_CACHE_SIZE),
+        )
+    return _token_cache
+
+
+def decode_jwt(token: str) -> Any:
+    return jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+
+
+def decode_verified(token: str, decoder: Callable[[str], Any] = decode_jwt) -> dict[str, Any] | None:
+    """
+    Decodes and verifies token, result is cached by token digest
+    Valid tokens are cached until their exp (tokens without exp for JWT_TOKEN_CACHE_TTL),
+    invalid and expired ones for JWT_INVALID_TOKEN_CACHE_TTL
+    Returned payload is shared between callers and must not be modified
+    """
+    cache = get_token_cache()
+    key = hashlib.sha256(f'{decoder.__name__}:{token}'.encode('utf-8')).digest()
+    entry = cache.get_entry(key)
+    if entry is not None:
+        token_cache_hits.inc()
+        return entry[0]
+    token_cache_misses.inc()
     try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        if payload["type"] != expected_type:
-            return None
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None   # token is expired
-    except jwt.InvalidTokenError:
-        return None   # token is invalid
+        payload = decoder(token)
+    except (jwt.InvalidTokenError, signing.BadSignature, ValueError):
+        # Includes expired tokens
+        cache.set(key, None, ttl=getattr(settings, 'JWT_INVALID_TOKEN_CACHE_TTL', DEFAULT_INVALID_TOKEN_CACHE_TTL))
+        return None
+    if not isinstance(payload, dict):
+        return None
+    exp = payload.get('exp')
+    if exp is None:
+        cache.set(key, payload)
+    else:
+        ttl = float(exp) - time.time()
+        if ttl > 0:
+            cache.set(key, payload, ttl=ttl)
+    return payload
+
+
+def decode_jwt_token(token: str, expected_type: Literal["access"] | Literal["refresh"]) -> JwtPayload | None:
+    payload = decode_verified(token)
+    if payload is None or payload.get("type") != expected_type:
+        return None
+    return payload # type: ignore
+
+
+class SessionTooLarge(Exception):
+    pass
+
+
+def encode_compact_session(data: dict[str, Any]) -> str:
+    signed = signing.dumps(data, key=settings.JWT_SECRET, salt=COMPACT_SESSION_SALT, compress=True)
+    return f'{COMPACT_SESSION_PREFIX}{signed}'
+
+
+def decode_compact_session(session_key: str) -> Any:
+    return signing.loads(session_key[len(COMPACT_SESSION_PREFIX):], key=settings.JWT_SECRET, salt=COMPACT_SESSION_SALT)
+
+
+def decode_session_key(session_key: str) -> dict[str, Any] | None:
+    """
+    Both formats are accepted, so JWT_SESSION_COMPACT can be switched without logging users out
+    """
+    if session_key.startswith(COMPACT_SESSION_PREFIX):
+        return decode_verified(session_key, decode_compact_session)
+    return decode_verified(session_key)
+
+
+def get_session_hash(data: dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
 
 
 class SessionStore(SessionBase):
+    """
+    Session data is stored in the signed key itself, as JWT or in compact format if JWT_SESSION_COMPACT is set
+    Compact format is JSON compressed with zlib and signed by django signing, it has versioned prefix
+    """
+    _loaded_hash: str | None = None
+
     def load(self) -> dict[str, Any]:
         """
         Load the data from the key itself instead of fetching from some
         external data store. Opposite of _get_session_key(), raise BadSignature
         if signature fails.
         """
-        try:
-            return jwt.decode(self.session_key or "", settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        except Exception:
-            # BadSignature, ValueError, or unpickling exceptions. If any of
-            # these happen, reset the session.
+        payload = decode_session_key(self.session_key or "")
+        if payload is None:
+            # Invalid signature or malformed token, reset the session
             self.create()
-        return {}
+            return {}
+        self._loaded_hash = get_session_hash(payload)
+        # Session data is modified in place, so cached payload is copied
+        return copy.deepcopy(payload)
 
     async def aload(self):
         return self.load()
@@ -121,7 +225,18 @@ class SessionStore(SessionBase):
         base64-encoded string of data as our session key.
         """
         session_data = self._get_session_data()
-        return jwt.encode(session_data, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+        if self.session_key and self._loaded_hash == get_session_hash(session_data):
+            # Content is unchanged, current key is still valid
+            return self.session_key
+        if getattr(settings, 'JWT_SESSION_COMPACT', False):
+            session_key = encode_compact_session(session_data)
+        else:
+            session_key = jwt.encode(session_data, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+        max_size = getattr(settings, 'JWT_SESSION_MAX_SIZE', DEFAULT_SESSION_MAX_SIZE)
+        if len(session_key) > max_size:
+            raise SessionTooLarge(f'Session key is {len(session_key)} bytes, limit is {max_size}')
+        self._loaded_hash = get_session_hash(session_data)
+        return session_key
 
     @classmethod
     def clear_expired(cls):
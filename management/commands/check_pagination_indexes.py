@@ -0,0 +1,27 @@
+from typing import Any
+from django.core.management.base import BaseCommand, CommandParser
+from django.urls import get_resolver
+from django_utils.pagination_checks import find_missing_indexes, find_unchecked_endpoints
+
+
+class Command(BaseCommand):
+    help = 'Reports paginated endpoints without composite (date, id) index and prints DDL to add them'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        # Paginated endpoints are registered when url configuration is imported
+        get_resolver().url_patterns
+        missing_indexes = find_missing_indexes(using=options['database'])
+        unchecked_endpoints = find_unchecked_endpoints()
+        for endpoint in unchecked_endpoints:
+            self.stdout.write(self.style.WARNING(f'{endpoint.url}: index can not be checked, model is unknown or date field is on related model'))
+        if not missing_indexes and not unchecked_endpoints:
+            self.stdout.write(self.style.SUCCESS('All paginated endpoints have suitable indexes'))
+            return
+        for missing in missing_indexes:
+            self.stdout.write(self.style.WARNING(
+                f'{missing.url} ({missing.model._meta.label}): missing index on ({", ".join(missing.columns)})'
+            ))
+            self.stdout.write(missing.ddl)
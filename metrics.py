@@ -0,0 +1,336 @@
+from bisect import bisect_left
+from typing import Any, Callable, Iterable, Iterator, Sequence
+from django.conf import settings
+import json
+import os
+import re
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+RATIO_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+DEFAULT_FLUSH_INTERVAL = 10
+DEFAULT_STALE_TIMEOUT = 300
+
+LabelValues = tuple[str, ...]
+# Metric suffix, label values and value
+Sample = tuple[str, LabelValues, float]
+
+INVALID_NAME_CHARS = re.compile(r'[^a-zA-Z0-9_:]')
+
+
+def sanitize_name(name: str) -> str:
+    return INVALID_NAME_CHARS.sub('_', name)
+
+
+class Metric:
+    """
+    Base of process wide metrics, updates are not locked and rely on GIL
+    Metrics with labelnames are updated through children returned by labels()
+    """
+    type = 'untyped'
+
+    def __init__(
+        self, name: str, description: str = '', labelnames: Sequence[str] = (), registry: 'Registry | None' = None
+    ) -> None:
+        self.name = sanitize_name(name)
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.children: dict[LabelValues, Any] = {}
+        (registry or REGISTRY).register(self)
+
+    def new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children.setdefault(key, self.new_child())
+        return child
+
+    def samples(self) -> Iterator[Sample]:
+        if not self.labelnames:
+            yield from self.child_samples() # type: ignore
+        for key, child in list(self.children.items()):
+            for suffix, _, value in child.child_samples():
+                yield suffix, key, value
+
+
+class CounterValue:
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value: float = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def child_samples(self) -> Iterator[Sample]:
+        yield '_total', (), self.value
+
+
+class Counter(Metric, CounterValue):
+    """
+    Monotonic counter
+    """
+    type = 'counter'
+
+    def __init__(self, name: str, description: str = '', labelnames: Sequence[str] = (), registry: 'Registry | None' = None) -> None:
+        CounterValue.__init__(self)
+        super().__init__(name.removesuffix('_total'), description, labelnames, registry)
+
+    def new_child(self) -> CounterValue:
+        return CounterValue()
+
+
+class GaugeValue:
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value: float = 0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def child_samples(self) -> Iterator[Sample]:
+        yield '', (), self.value
+
+
+class Gauge(Metric, GaugeValue):
+    type = 'gauge'
+
+    def __init__(self, name: str, description: str = '', labelnames: Sequence[str] = (), registry: 'Registry | None' = None) -> None:
+        GaugeValue.__init__(self)
+        super().__init__(name, description, labelnames, registry)
+
+    def new_child(self) -> GaugeValue:
+        return GaugeValue()
+
+
+class HistogramValue:
+    """
+    Histogram with fixed buckets, last bucket counts values above the largest bound
+    """
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum: float = 0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def child_samples(self) -> Iterator[Sample]:
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            yield f'_bucket:{bound}', (), cumulative
+        yield '_bucket:+Inf', (), self.count
+        yield '_sum', (), self.sum
+        yield '_count', (), self.count
+
+
+class Histogram(Metric, HistogramValue):
+    type = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        description: str = '',
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        labelnames: Sequence[str] = (),
+        registry: 'Registry | None' = None,
+    ) -> None:
+        HistogramValue.__init__(self, buckets)
+        super().__init__(name, description, labelnames, registry)
+
+    def new_child(self) -> HistogramValue:
+        return HistogramValue(self.buckets)
+
+
+class Registry:
+    """
+    All metrics of the process
+    With METRICS_DIR setting each process periodically writes its samples to the shared directory
+    and exposition merges samples of all live processes
+    """
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+        # Called before collection to update gauges of external state
+        self.collectors: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._flusher: threading.Thread | None = None
+        self._flusher_args: tuple[str, float] | None = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def register(self, metric: Metric) -> None:
+        with self._lock:
+            self.metrics[metric.name] = metric
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if directory is not None and self._flusher is None:
+            self.start_flusher(directory, getattr(settings, 'METRICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL))
+
+    def register_collector(self, collector: Callable[[], None]) -> None:
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def collect(self) -> dict[str, dict[str, float]]:
+        """
+        Samples keyed by metric name, then by encoded suffix and label values
+        """
+        for collector in list(self.collectors):
+            collector()
+        result: dict[str, dict[str, float]] = {}
+        for name, metric in list(self.metrics.items()):
+            result[name] = {
+                json.dumps([suffix, list(labels)]): value for suffix, labels, value in metric.samples()
+            }
+        return result
+
+    def start_flusher(self, directory: str, interval: float = DEFAULT_FLUSH_INTERVAL) -> None:
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher_args = (directory, interval)
+            self._flusher = threading.Thread(
+                target=self.flush_forever, args=self._flusher_args, name='metrics-flusher', daemon=True
+            )
+        self._flusher.start()
+
+    def _after_fork(self) -> None:
+        # Threads are not inherited by forked workers (e.g. gunicorn --preload), each child starts its own flusher
+        self._lock = threading.Lock()
+        self._flusher = None
+        if self._flusher_args is not None:
+            self.start_flusher(*self._flusher_args)
+
+    def flush(self, directory: str) -> None:
+        path = os.path.join(directory, f'metrics_{os.getpid()}.json')
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.collect(), f)
+        # Readers never see partially written file
+        os.replace(temp_path, path)
+
+    def flush_forever(self, directory: str, interval: float) -> None:
+        os.makedirs(directory, exist_ok=True)
+        while True:
+            self.flush(directory)
+            time.sleep(interval)
+
+    def collect_all(self, directory: str | None, stale_timeout: float = DEFAULT_STALE_TIMEOUT) -> dict[str, dict[str, float]]:
+        """
+        Samples of the current process merged with fresh files of live processes
+        Counters and histograms are summed, gauges get pid label with a series per process
+        """
+        own_samples = self.collect()
+        if directory is None or not os.path.isdir(directory):
+            return own_samples
+        result: dict[str, dict[str, float]] = {}
+        self.merge(result, own_samples, os.getpid())
+        now = time.time()
+        for file_name in os.listdir(directory):
+            if not file_name.startswith('metrics_') or not file_name.endswith('.json'):
+                continue
+            try:
+                pid = int(file_name.removeprefix('metrics_').removesuffix('.json'))
+            except ValueError:
+                continue
+            if pid == os.getpid() or not is_process_alive(pid):
+                continue
+            path = os.path.join(directory, file_name)
+            try:
+                if now - os.path.getmtime(path) > stale_timeout:
+                    continue
+                with open(path) as f:
+                    data: dict[str, dict[str, float]] = json.load(f)
+            except (OSError, ValueError):
+                continue
+            self.merge(result, data, pid)
+        return result
+
+    def merge(self, result: dict[str, dict[str, float]], samples: dict[str, dict[str, float]], pid: int) -> None:
+        for name, metric_samples in samples.items():
+            metric = self.metrics.get(name)
+            # Sum of gauges (pool size, queue depth) would multiply them by the number of processes
+            is_gauge = metric is not None and metric.type == 'gauge'
+            merged = result.setdefault(name, {})
+            for key, value in metric_samples.items():
+                if is_gauge:
+                    suffix, label_values = json.loads(key)
+                    key = json.dumps([suffix, [*label_values, str(pid)]])
+                merged[key] = merged.get(key, 0) + value
+
+    def exposition(self, samples: dict[str, dict[str, float]]) -> str:
+        """
+        Prometheus text format
+        """
+        lines: list[str] = []
+        for name, metric_samples in sorted(samples.items()):
+            metric = self.metrics.get(name)
+            if metric is not None:
+                # Counter samples have _total suffix, TYPE and HELP use the same name
+                family = f'{name}_total' if metric.type == 'counter' else name
+                lines.append(f'# HELP {family} {escape_help(metric.description)}')
+                lines.append(f'# TYPE {family} {metric.type}')
+                labelnames = metric.labelnames
+            else:
+                labelnames = ()
+            for key, value in metric_samples.items():
+                suffix, label_values = json.loads(key)
+                # Gauges merged from several processes have pid label value after the metric labels
+                names = (*labelnames, 'pid') if len(label_values) > len(labelnames) else labelnames
+                labels = list(zip(names, label_values))
+                suffix, _, bound = suffix.partition(':')
+                if bound:
+                    labels.append(('le', bound))
+                lines.append(f'{name}{suffix}{format_labels(labels)} {format_value(value)}')
+        lines.append('')
+        return '\n'.join(lines)
+
+
+def is_process_alive(pid: int) -> bool:
+    """
+    Processes writing to METRICS_DIR are expected to share pid namespace (workers of one server)
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(labels: Iterable[tuple[str, str]]) -> str:
+    parts = [f'{name}="{escape_label(value)}"' for name, value in labels]
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+REGISTRY = Registry()
@@ -0,0 +1,58 @@
+from ninja import Router
+from ninja.security import HttpBearer
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django_utils.auth import django_auth
+from django_utils.metrics import REGISTRY
+from django_utils.permissions import permission_required, PermissionRequirement
+from django_utils.slow_queries import SlowQuery, get_slow_queries
+import hmac
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_SLOW_QUERIES_LIMIT = 50
+
+metrics_router = Router()
+slow_queries_router = Router()
+
+
+class MetricsTokenAuth(HttpBearer):
+    """
+    Scraper sends METRICS_TOKEN as bearer token, endpoint is closed if the setting is not set
+    """
+    def authenticate(self, request: HttpRequest, token: str) -> bool | None:
+        expected = getattr(settings, 'METRICS_TOKEN', None)
+        if expected is None or not hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8')):
+            return None
+        return True
+
+
+@metrics_router.get('/metrics', auth=MetricsTokenAuth(), include_in_schema=False)
+def get_metrics(request: HttpRequest) -> HttpResponse:
+    """
+    Metrics of all worker processes in Prometheus text format
+    Processes share samples through METRICS_DIR, without it only the current process is exposed
+    """
+    samples = REGISTRY.collect_all(getattr(settings, 'METRICS_DIR', None))
+    return HttpResponse(REGISTRY.exposition(samples), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+async def list_slow_queries(
+    request: HttpRequest, min_duration: float = 0, cancelled: bool | None = None, limit: int = DEFAULT_SLOW_QUERIES_LIMIT
+) -> list[SlowQuery]:
+    """
+    Recent slow and cancelled queries of the process that handles the request, newest first
+    """
+    result: list[SlowQuery] = []
+    for query in reversed(list(get_slow_queries())):
+        if len(result) >= limit:
+            break
+        if query.duration < min_duration or (cancelled is not None and query.cancelled != cancelled):
+            continue
+        result.append(query)
+    return result
+
+
+slow_queries_router.get('/slow_queries', response=list[SlowQuery], auth=django_auth, include_in_schema=False)(
+    permission_required(list_slow_queries, PermissionRequirement(staff=True))
+)
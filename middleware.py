@@ -3,12 +3,22 @@ from django.conf import settings
 from django.contrib.sessions.middleware import SessionMiddleware
 from django.contrib.sessions.backends.base import UpdateError
 from django.contrib.sessions.exceptions import SessionInterrupted
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+from django.db.models.signals import post_save
 from django.utils.http import http_date
-from typing import Callable, Any
+from django.utils.cache import patch_vary_headers
+from django.urls import get_resolver
+from django.http.response import HttpResponseBase
+from typing import Callable, Any, AsyncIterator, Hashable, Iterable, Iterator
 import time
 import json
 import base64
-from asgiref.sync import async_to_sync
+import secrets
+import zlib
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction
+from django_utils.cache import TTLCache
+from django_utils.metrics import Counter, Histogram, RATIO_BUCKETS
 
 try:
     from users.frontend_user_data import get_user_data
@@ -16,78 +26,432 @@ except ImportError:
     get_user_data = None
 
 
+EXTRA_DOMAINS_URLCONF = 'application.extra_urls'
+
+
+class DomainRouter:
+    """
+    Host to urlconf routing table
+    Keys starting with *. match any subdomain, more specific suffixes take precedence
+    """
+    def __init__(self, routes: dict[str, str]) -> None:
+        self.exact: dict[str, str] = {}
+        self.wildcards: dict[str, str] = {}
+        for host, urlconf in routes.items():
+            host = host.lower()
+            if host.startswith('*.'):
+                self.wildcards[host[2:]] = urlconf
+            else:
+                self.exact[host] = urlconf
+
+    @classmethod
+    def from_settings(cls) -> 'DomainRouter':
+        """
+        EXTRA_DOMAINS are routed to application.extra_urls, DOMAIN_URLCONFS is a dict of host to urlconf
+        """
+        routes = {host: EXTRA_DOMAINS_URLCONF for host in getattr(settings, 'EXTRA_DOMAINS', [])}
+        routes.update(getattr(settings, 'DOMAIN_URLCONFS', {}))
+        return cls(routes)
+
+    def get_urlconf(self, host: str) -> str | None:
+        urlconf = self.exact.get(host)
+        if urlconf is not None or not self.wildcards:
+            return urlconf
+        position = host.find('.')
+        while position != -1:
+            urlconf = self.wildcards.get(host[position + 1:])
+            if urlconf is not None:
+                return urlconf
+            position = host.find('.', position + 1)
+        return None
+
+    def urlconfs(self) -> set[str]:
+        return set(self.exact.values()) | set(self.wildcards.values())
+
+
+def warm_up_resolvers(urlconfs: Iterable[str | None]) -> None:
+    """
+    Imports urlconfs and populates resolvers, so the first request does not pay for it
+    """
+    for urlconf in urlconfs:
+        get_resolver(urlconf).reverse_dict
+
+
 class DomainRoutingMiddleware:
-    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]):
         self.get_response = get_response
+        self.router = DomainRouter.from_settings()
+        if getattr(settings, 'DOMAIN_ROUTING_WARM_UP', True):
+            warm_up_resolvers([None, *self.router.urlconfs()])
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
-    def __call__(self, request: HttpRequest) -> HttpResponse:
+    def route(self, request: HttpRequest) -> None:
         host = request.get_host().split(':')[0].lower()
+        urlconf = self.router.get_urlconf(host)
+        if urlconf is not None:
+            request.urlconf = urlconf # type: ignore
 
-        if host in settings.EXTRA_DOMAINS:
-            # If host in extra domains, use custom urls
-            request.urlconf = 'application.extra_urls' # type: ignore
-
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.async_mode:
+            return self.__acall__(request)
+        self.route(request)
         return self.get_response(request)
 
+    async def __acall__(self, request: HttpRequest) -> HttpResponseBase:
+        self.route(request)
+        return await self.get_response(request)
+
+
+DEFAULT_COMPRESSION_LEVEL = 6
+DEFAULT_COMPRESSION_MIN_LENGTH = 500
+DEFAULT_COMPRESSION_MAX_RANDOM_BYTES = 100
+COMPRESSIBLE_CONTENT_TYPES = (
+    'text/', 'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml',
+)
+# zlib wbits for HTTP content codings, deflate is zlib wrapped stream
+COMPRESSION_WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+GZIP_HEADER_SIZE = 10
+GZIP_FLAG_FNAME = 0x08
+
+compression_input_bytes = Counter('http_compression_input_bytes', 'Response bytes before compression')
+compression_output_bytes = Counter('http_compression_output_bytes', 'Response bytes after compression')
+compression_ratio = Histogram('http_compression_ratio', 'Compressed to original size ratio', buckets=RATIO_BUCKETS)
+compression_cpu_seconds = Histogram('http_compression_cpu_seconds', 'CPU time spent compressing a response')
+
+
+def get_accepted_encoding(accept_encoding: str, codings: Iterable[str] = COMPRESSION_WBITS) -> str | None:
+    """
+    Picks one of codings (gzip or deflate) from Accept-Encoding header, codings with q=0 are refused
+    """
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0
+        accepted[coding.strip().lower()] = quality
+    for coding in codings:
+        if accepted.get(coding, accepted.get('*', 0)) > 0:
+            return coding
+    return None
+
+
+def record_compression(input_size: int, output_size: int, cpu_time: float) -> None:
+    compression_input_bytes.inc(input_size)
+    compression_output_bytes.inc(output_size)
+    compression_cpu_seconds.observe(cpu_time)
+    if input_size > 0:
+        compression_ratio.observe(output_size / input_size)
+
+
+class StreamCompressor:
+    """
+    Compresses chunks incrementally, each chunk is flushed so client receives data without delay
+    With max_random_bytes gzip header gets file name of random length, same as Django GZipMiddleware does against BREACH
+    """
+    def __init__(self, coding: str, level: int, max_random_bytes: int = 0) -> None:
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, COMPRESSION_WBITS[coding])
+        self.padding: bytes | None = None
+        if coding == 'gzip' and max_random_bytes > 0:
+            self.padding = b'a' * secrets.randbelow(max_random_bytes)
+        self.input_size = 0
+        self.output_size = 0
+        self.cpu_time = 0.0
+
+    def pad(self, data: bytes) -> bytes:
+        # zlib writes the whole gzip header with the first output
+        if self.padding is None or not data:
+            return data
+        header = bytearray(data[:GZIP_HEADER_SIZE])
+        header[3] |= GZIP_FLAG_FNAME
+        padded = bytes(header) + self.padding + b'\x00' + data[GZIP_HEADER_SIZE:]
+        self.padding = None
+        return padded
+
+    def compress(self, chunk: bytes) -> bytes:
+        started = time.thread_time()
+        data = self.pad(self.compressor.compress(chunk) + self.compressor.flush(zlib.Z_SYNC_FLUSH))
+        self.cpu_time += time.thread_time() - started
+        self.input_size += len(chunk)
+        self.output_size += len(data)
+        return data
+
+    def finish(self) -> bytes:
+        data = self.pad(self.compressor.flush())
+        self.output_size += len(data)
+        record_compression(self.input_size, self.output_size, self.cpu_time)
+        return data
+
+    def compress_iterator(self, content: Iterator[bytes]) -> Iterator[bytes]:
+        for chunk in content:
+            data = self.compress(chunk)
+            if data:
+                yield data
+        yield self.finish()
+
+    async def compress_async_iterator(self, content: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in content:
+            data = self.compress(chunk)
+            if data:
+                yield data
+        yield self.finish()
+
+
+class CompressionMiddleware:
+    """
+    Gzip/deflate compression supporting async streaming responses
+    Streaming content is compressed chunk by chunk instead of being buffered
+    Against BREACH gzip output is padded with up to COMPRESSION_MAX_RANDOM_BYTES,
+    deflate can't be padded and is negotiated only when padding is disabled with 0
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]):
+        self.get_response = get_response
+        self.level = getattr(settings, 'COMPRESSION_LEVEL', DEFAULT_COMPRESSION_LEVEL)
+        self.min_length = getattr(settings, 'COMPRESSION_MIN_LENGTH', DEFAULT_COMPRESSION_MIN_LENGTH)
+        self.max_random_bytes = getattr(settings, 'COMPRESSION_MAX_RANDOM_BYTES', DEFAULT_COMPRESSION_MAX_RANDOM_BYTES)
+        self.codings = ('gzip',) if self.max_random_bytes > 0 else tuple(COMPRESSION_WBITS)
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponseBase:
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def is_compressible(self, response: HttpResponseBase) -> bool:
+        if response.has_header('Content-Encoding') or response.status_code in (204, 304):
+            return False
+        content_type = response.get('Content-Type', '')
+        return content_type.startswith(COMPRESSIBLE_CONTENT_TYPES)
+
+    def process_response(self, request: HttpRequest, response: HttpResponseBase) -> HttpResponseBase:
+        if not self.is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = get_accepted_encoding(request.headers.get('Accept-Encoding', ''), self.codings)
+        if coding is None:
+            return response
+
+        compressor = StreamCompressor(coding, self.level, self.max_random_bytes)
+        if response.streaming:
+            if response.is_async: # type: ignore
+                response.streaming_content = compressor.compress_async_iterator(response.streaming_content) # type: ignore
+            else:
+                response.streaming_content = compressor.compress_iterator(response.streaming_content) # type: ignore
+            del response['Content-Length']
+        else:
+            content: bytes = response.content # type: ignore
+            if len(content) < self.min_length:
+                return response
+            compressed = compressor.compress(content) + compressor.finish()
+            if len(compressed) >= len(content):
+                return response
+            response.content = compressed # type: ignore
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            # Compressed body is not byte for byte equal to the original
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+        return response
+
+
+# Cache is opt-in, it requires get_user_data to depend only on the user
+DEFAULT_USER_DATA_CACHE_TTL: float | None = None
+DEFAULT_USER_DATA_CACHE_SIZE = 10000
+USER_DATA_VERSION_KEY_PREFIX = 'django_utils:user_data_version:'
+
+_encoded_user_data_cache: TTLCache[str] | None = None
+
+
+def get_encoded_user_data_cache() -> TTLCache[str]:
+    global _encoded_user_data_cache
+    if _encoded_user_data_cache is None:
+        _encoded_user_data_cache = TTLCache(
+            ttl=getattr(settings, 'USER_DATA_COOKIE_CACHE_TTL', DEFAULT_USER_DATA_CACHE_TTL) or 0,
+            max_size=DEFAULT_USER_DATA_CACHE_SIZE,
+        )
+    return _encoded_user_data_cache
+
+
+def get_user_data_versions_cache() -> Any:
+    """
+    Versions should be shared between processes, USER_DATA_VERSION_CACHE is the name of django cache
+    """
+    return caches[getattr(settings, 'USER_DATA_VERSION_CACHE', 'default')]
+
+
+def get_user_data_version_key(user_id: Any) -> str:
+    return f'{USER_DATA_VERSION_KEY_PREFIX}{user_id}'
+
+
+def bump_user_data_version(user_id: Any) -> None:
+    """
+    Should be called when anything returned by get_user_data changes, user changes are tracked automatically
+    """
+    get_user_data_versions_cache().set(get_user_data_version_key(user_id), time.time_ns(), None)
+
+
+def on_user_changed(sender: Any, instance: Any, **kwargs: Any) -> None:
+    bump_user_data_version(instance.pk)
+
+
+post_save.connect(on_user_changed, sender=settings.AUTH_USER_MODEL, dispatch_uid='django_utils_user_data_version')
+
+
+def encode_user_data(user_data: dict[str, Any] | None) -> str | None:
+    if user_data is None:
+        return None
+    # base64 only to hide data in from casual user, it obviosly doesn't add security
+    # This is used only on the client side for speeding things up, for server side we use signed session token
+    data = json.dumps(user_data).encode('utf-8')
+    return base64.b64encode(data).decode('ascii')
+
 
 class JwtSessionMiddleware(SessionMiddleware):
     """
     Redefined middleware to add separate user data cookie acessible from javascript
     It allows to access user data without extra requests to the server
     get_user_data function is defined in users/frontend_user_data.py 
+    Under ASGI get_user_data is awaited directly, session store keeps data in the cookie and saving it does no IO
+    With USER_DATA_COOKIE_CACHE_TTL seconds encoded user data is cached per user and user data version,
+    it is enabled only if get_user_data depends only on the user (not on language, domain or headers)
     """
     def get_user_data_for_frontend(self, request: HttpRequest) -> dict[str, Any] | None:
         if get_user_data is None:
             return {}
         return async_to_sync(get_user_data)(request)
 
-    def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
-        result = super().process_response(request, response)
+    async def aget_user_data_for_frontend(self, request: HttpRequest) -> dict[str, Any] | None:
+        if get_user_data is None:
+            return {}
+        return await get_user_data(request)
+
+    def needs_user_data(self, request: HttpRequest, response: HttpResponse) -> bool:
+        """
+        Deletes user data cookie for empty session, True if cookie should be refreshed
+        """
         try:
             modified = request.session.modified
             empty = request.session.is_empty()
         except AttributeError:
-            return response
- 
+            return False
+
         cookie_name = settings.USER_DATA_COOKIE_NAME
         if cookie_name is not None and cookie_name in request.COOKIES and empty:
             response.delete_cookie(cookie_name)
+            return False
+        # Skip session save for 5xx responses.
+        return modified and not empty and get_user_data is not None and response.status_code < 500
+
+    def set_user_data_cookie(self, request: HttpRequest, response: HttpResponse, encoded: str) -> None:
+        if request.session.get_expire_at_browser_close():
+            max_age = None
+            expires = None
         else:
-            if modified and not empty and get_user_data is not None:
-                if request.session.get_expire_at_browser_close():
-                    max_age = None
-                    expires = None
-                else:
-                    max_age = request.session.get_expiry_age()
-                    expires_time = time.time() + max_age
-                    expires = http_date(expires_time)
-                # Save the session data and refresh the client cookie.
-                # Skip session save for 5xx responses.
-                if response.status_code < 500:
-                    try:
-                        request.session.save()
-                    except UpdateError:
-                        raise SessionInterrupted(
-                            "The request's session was deleted before the "
-                            "request completed. The user may have logged "
-                            "out in a concurrent request, for example."
-                        )
-                    # base64 only to hide data in from casual user, it obviosly doesn't add security
-                    # This is used only on the client side for speeding things up, for server side we use signed session token
-                    user_data = self.get_user_data_for_frontend(request)
-                    if user_data is not None:
-                        data = json.dumps(user_data).encode('utf-8')
-                        data = base64.b64encode(data).decode('ascii')
-                        
-                        response.set_cookie(
-                            cookie_name,
-                            data,
-                            max_age=max_age,
-                            expires=expires,
-                            domain=settings.SESSION_COOKIE_DOMAIN,
-                            path=settings.SESSION_COOKIE_PATH,
-                            secure=True,
-                            httponly=False,
-                            samesite="Strict",
-                        )
-        return result
\ No newline at end of file
+            max_age = request.session.get_expiry_age()
+            expires_time = time.time() + max_age
+            expires = http_date(expires_time)
+
+        response.set_cookie(
+            settings.USER_DATA_COOKIE_NAME,
+            encoded,
+            max_age=max_age,
+            expires=expires,
+            domain=settings.SESSION_COOKIE_DOMAIN,
+            path=settings.SESSION_COOKIE_PATH,
+            secure=True,
+            httponly=False,
+            samesite="Strict",
+        )
+
+    def get_session_user_id(self, request: HttpRequest) -> Any | None:
+        if getattr(settings, 'USER_DATA_COOKIE_CACHE_TTL', DEFAULT_USER_DATA_CACHE_TTL) is None:
+            return None
+        return request.session.get(SESSION_KEY)
+
+    def get_user_data_cache_key(self, request: HttpRequest) -> Hashable | None:
+        user_id = self.get_session_user_id(request)
+        if user_id is None:
+            return None
+        return (user_id, get_user_data_versions_cache().get(get_user_data_version_key(user_id), 0))
+
+    async def aget_user_data_cache_key(self, request: HttpRequest) -> Hashable | None:
+        user_id = self.get_session_user_id(request)
+        if user_id is None:
+            return None
+        return (user_id, await get_user_data_versions_cache().aget(get_user_data_version_key(user_id), 0))
+
+    def update_user_data_cookie(
+        self, request: HttpRequest, response: HttpResponse, cache_key: Hashable | None, encoded: str | None
+    ) -> None:
+        """
+        Set-Cookie is skipped if client already has current data
+        """
+        if encoded is None:
+            return
+        if cache_key is not None:
+            get_encoded_user_data_cache().set(cache_key, encoded)
+        if request.COOKIES.get(settings.USER_DATA_COOKIE_NAME) != encoded:
+            self.set_user_data_cookie(request, response, encoded)
+
+    def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        result = super().process_response(request, response)
+        if self.needs_user_data(request, response):
+            # Save the session data and refresh the client cookie.
+            try:
+                request.session.save()
+            except UpdateError:
+                raise SessionInterrupted(
+                    "The request's session was deleted before the "
+                    "request completed. The user may have logged "
+                    "out in a concurrent request, for example."
+                )
+            cache_key = self.get_user_data_cache_key(request)
+            encoded = None if cache_key is None else get_encoded_user_data_cache().get(cache_key)
+            if encoded is None:
+                encoded = encode_user_data(self.get_user_data_for_frontend(request))
+            self.update_user_data_cookie(request, response, cache_key, encoded)
+        return result
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        self.process_request(request)
+        response = await self.get_response(request) # type: ignore
+        result = super().process_response(request, response)
+        if self.needs_user_data(request, response):
+            try:
+                await request.session.asave()
+            except UpdateError:
+                raise SessionInterrupted(
+                    "The request's session was deleted before the "
+                    "request completed. The user may have logged "
+                    "out in a concurrent request, for example."
+                )
+            cache_key = await self.aget_user_data_cache_key(request)
+            encoded = None if cache_key is None else get_encoded_user_data_cache().get(cache_key)
+            if encoded is None:
+                encoded = encode_user_data(await self.aget_user_data_for_frontend(request))
+            self.update_user_data_cookie(request, response, cache_key, encoded)
+        return result
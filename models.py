@@ -22,4 +22,16 @@ class BaseUser(AbstractUser):
     class Meta:
         abstract = True
         verbose_name = 'Пользователь'
-        verbose_name_plural = 'Пользователи'
\ No newline at end of file
+        verbose_name_plural = 'Пользователи'
+
+class BaseRevokedToken(models.Model):
+    """
+        Revoked refresh tokens, concrete model is set in REVOKED_TOKEN_MODEL setting
+    """
+    jti = models.CharField[str, str](max_length=64, unique=True)
+    user_id = models.BigIntegerField[int, int](db_index=True)
+    revoked_at = models.DateTimeField[datetime, datetime](default=timezone.now, db_index=True)
+    expires_at = models.DateTimeField[datetime, datetime](db_index=True)
+
+    class Meta:
+        abstract = True
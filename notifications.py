@@ -0,0 +1,152 @@
+from typing import Any, Type
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.db.models.signals import post_save, post_delete
+from django.utils.module_loading import import_string
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+POSTGRES_CHANNEL = 'django_utils_changes'
+
+DEFAULT_NOTIFIER = 'django_utils.notifications.ChangeNotifier'
+LISTENER_READY_TIMEOUT = 5
+
+
+class ChangeNotifier:
+    """
+    In-process pub/sub for model changes, used by long polling endpoints
+    Waiter subscribes before querying, so change that happens between query and wait is not lost
+    """
+    def __init__(self) -> None:
+        # Event per channel and event loop, waiters of every loop are woken up
+        self._events: dict[str, dict[asyncio.AbstractEventLoop, asyncio.Event]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel: str) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            loop_events = self._events.setdefault(channel, {})
+            event = loop_events.get(loop)
+            if event is None:
+                event = loop_events[loop] = asyncio.Event()
+        return event
+
+    async def asubscribe(self, channel: str) -> asyncio.Event:
+        """
+        Returns after the backend is ready to deliver changes of the channel
+        """
+        return self.subscribe(channel)
+
+    def notify_subscribers(self, channel: str) -> None:
+        with self._lock:
+            loop_events = self._events.pop(channel, {})
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        for loop, event in loop_events.items():
+            if running_loop is loop:
+                event.set()
+            elif not loop.is_closed():
+                # Signals are usually sent from sync_to_async worker thread
+                loop.call_soon_threadsafe(event.set)
+
+    def publish(self, channel: str) -> None:
+        self.notify_subscribers(channel)
+
+    def notify_all(self) -> None:
+        with self._lock:
+            channels = list(self._events)
+        for channel in channels:
+            self.notify_subscribers(channel)
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except TimeoutError:
+            return False
+        return True
+
+
+class PostgresChangeNotifier(ChangeNotifier):
+    """
+    Delivers changes between processes with LISTEN/NOTIFY
+    asubscribe waits until LISTEN is active, so NOTIFY sent right after it is not lost
+    """
+    def __init__(self, using: str = 'default') -> None:
+        super().__init__()
+        self.using = using
+        self._listener: asyncio.Task[None] | None = None
+        self._ready: asyncio.Event | None = None
+
+    async def asubscribe(self, channel: str) -> asyncio.Event:
+        if self._listener is None or self._listener.done():
+            self._ready = asyncio.Event()
+            self._listener = asyncio.get_running_loop().create_task(self.listen(self._ready))
+        event = self.subscribe(channel)
+        assert self._ready is not None
+        try:
+            await asyncio.wait_for(self._ready.wait(), LISTENER_READY_TIMEOUT)
+        except TimeoutError:
+            logger.warning('Change notification listener is not ready, changes may be delivered late')
+        return event
+
+    def publish(self, channel: str) -> None:
+        with connections[self.using].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [POSTGRES_CHANNEL, channel])
+
+    async def listen(self, ready: asyncio.Event) -> None:
+        import psycopg
+        params = connections[self.using].get_connection_params()
+        conninfo = {k: params[k] for k in ('dbname', 'user', 'password', 'host', 'port') if params.get(k)}
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(autocommit=True, **conninfo)
+                async with conn:
+                    await conn.execute(f'LISTEN {POSTGRES_CHANNEL}')
+                    ready.set()
+                    # Changes sent while listener was reconnecting are lost, waiters query again
+                    self.notify_all()
+                    async for notify in conn.notifies():
+                        self.notify_subscribers(notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Change notification listener failed, reconnecting')
+                await asyncio.sleep(1)
+
+
+_notifier: ChangeNotifier | None = None
+
+
+def get_notifier() -> ChangeNotifier:
+    """
+    Backend is configured with CHANGE_NOTIFIER setting
+    """
+    global _notifier
+    if _notifier is None:
+        _notifier = import_string(getattr(settings, 'CHANGE_NOTIFIER', DEFAULT_NOTIFIER))()
+    return _notifier # type: ignore
+
+
+def get_model_channel(model: Type[models.Model]) -> str:
+    return model._meta.label
+
+
+def publish_model_change(sender: Type[models.Model], **kwargs: Any) -> None:
+    # Waiter woken before commit would not see the change with its query
+    channel = get_model_channel(sender)
+    transaction.on_commit(lambda: get_notifier().publish(channel), using=kwargs.get('using'))
+
+
+def watch_model_changes(model: Type[models.Model]) -> None:
+    """
+    Publishes a notification on every save or delete of the model instance
+    Bulk operations and queryset updates do not send signals and are not observed
+    """
+    uid = f'django_utils_notifications_{get_model_channel(model)}'
+    post_save.connect(publish_model_change, sender=model, dispatch_uid=uid, weak=False)
+    post_delete.connect(publish_model_change, sender=model, dispatch_uid=uid, weak=False)
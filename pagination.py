@@ -1,35 +1,157 @@
 from ninja.pagination import PaginationBase
+from dataclasses import dataclass
 from typing import Any, Type, Sequence
 from django_utils.schema import DataclassProtocol, TransformListFunc, ModelProtocol
 from django_utils.queries import typed_data_list
+from django_utils.cache import AsyncCache, queryset_cache_key
+from django_utils.db_router import is_pinned_to_primary
+from django_utils.conditional import Validator, apply_validator, get_validator
+from django_utils.notifications import get_notifier, get_model_channel, watch_model_changes
+from django_utils.timing import timed
+from django_utils.metrics import Histogram
+from django.conf import settings
 from datetime import datetime
-from django.db import models
-from django.db.models import Q
+from django.db import models, connections
+from django.db.models import Q, F, Func, Value
+from django.db.models.lookups import LessThan, GreaterThan
+from asgiref.sync import sync_to_async
+import time
 
 
 DEFAULT_PER_PAGE = 30
 
+DEFAULT_LONG_POLL_MAX_TIMEOUT = 25
+
+pagination_page_seconds = Histogram('pagination_page_seconds', 'Time spent fetching and decoding a page', labelnames=('endpoint',))
+
+
+@dataclass(kw_only=True)
+class PaginatedEndpoint:
+    """
+    Registry entry used to verify that paginated models have suitable indexes
+    """
+    url: str | None
+    pagination: Type[PaginationBase]
+    model: Type[models.Model] | None
+    date_field: str | None = None
+
+
+PAGINATED_ENDPOINTS: list[PaginatedEndpoint] = []
+
+
+class RowValue(Func):
+    """
+    SQL row constructor, (a, b) < (x, y) comparisons use composite indexes directly
+    """
+    function = ''
+    template = '(%(expressions)s)'
+    output_field = models.Field()
+
+
+def timestamp_to_datetime(ms: int) -> datetime:
+    # timestamp in microseconds
+    return datetime.fromtimestamp(ms//1000000).replace(microsecond=ms%1000000) # to avoid floating point conversion
+
+
+def datetime_to_timestamp(value: datetime) -> int:
+    return int(value.timestamp() * 1000000)
+
+
+def supports_row_values(qset: models.QuerySet[Any]) -> bool:
+    return connections[qset.db].vendor == 'postgresql'
+
+
+def keyset_filter(
+    qset: models.QuerySet[Any], date_field: str, date: datetime, id: int | None, after: bool
+) -> models.QuerySet[Any]:
+    """
+    Filters records before (or after) the (date, id) position
+    On Postgres emits (date, id) < (x, y) which is resolved with a single range scan on (date, id) index
+    """
+    if id is None:
+        return qset.filter(**{f'{date_field}__{"gt" if after else "lt"}': date})
+    if supports_row_values(qset):
+        lookup = GreaterThan if after else LessThan
+        return qset.filter(lookup(
+            RowValue(F(date_field), F('id')),
+            RowValue(Value(date), Value(id)),
+        ))
+    if after:
+        date_filter = Q(**{f'{date_field}__gt': date})
+        id_filter = Q(id__gt=id, **{f'{date_field}': date})
+    else:
+        date_filter = Q(**{f'{date_field}__lt': date})
+        id_filter = Q(id__lt=id, **{f'{date_field}': date})
+    return qset.filter(date_filter | id_filter)
+
+
 class EfficientPagination[ResultType: DataclassProtocol](PaginationBase):
     def __init__(
         self,
         *,
         response_type: Type[ResultType],
         transform: TransformListFunc | None = None,
+        cache_ttl: float | None = None,
+        cache_stale_ttl: float = 0,
+        url: str | None = None,
+        model: Type[models.Model] | None = None,
         **kwargs: Any,
     ) -> None:
+        """
+        cache_ttl enables caching of the first page (request without cursor) per queryset signature
+        Concurrent cache misses are collapsed into a single query, validator is cached with the page
+        """
         self.response_type = response_type
         self.transform = transform
+        self.endpoint = PaginatedEndpoint(
+            url=url, pagination=type(self), model=model, date_field=getattr(self, 'date_field', None)
+        )
+        PAGINATED_ENDPOINTS.append(self.endpoint)
+        self.first_page_cache: AsyncCache[tuple[Validator | None, Sequence[Any]]] | None = None
+        if cache_ttl is not None:
+            self.first_page_cache = AsyncCache(ttl=cache_ttl, stale_ttl=cache_stale_ttl)
         super().__init__(**kwargs)
 
     def paginate_queryset(self, queryset: models.QuerySet[Any], pagination: Any, **params: Any) -> Any:
         raise NotImplementedError('Syncronous pagination is not supported in this project. apaginate_queryset should be implemented.')
 
+    def register_model(self, queryset: models.QuerySet[Any]) -> None:
+        # Model is not always known at declaration time, remember it on first request
+        if self.endpoint.model is None:
+            self.endpoint.model = queryset.model
+
     async def transform_queryset(
         self, queryset: models.QuerySet[Any]
     ):
-        if self.transform is not None:
-            return await self.transform(queryset)
-        return await typed_data_list(queryset, self.response_type)
+        started = time.perf_counter()
+        try:
+            with timed('page'):
+                if self.transform is not None:
+                    return await self.transform(queryset)
+                return await typed_data_list(queryset, self.response_type)
+        finally:
+            endpoint = self.endpoint.url or self.response_type.__name__
+            pagination_page_seconds.labels(endpoint).observe(time.perf_counter() - started)
+
+    async def transform_page(
+        self, queryset: models.QuerySet[Any], params: dict[str, Any], first_page: bool
+    ):
+        """
+        Raises NotModified before decoding the page if client has current data
+        """
+        request = params.get('request')
+        salt = self.response_type.__name__
+        # Cached page may be older than the write of the client pinned to the primary
+        if self.first_page_cache is None or not first_page or is_pinned_to_primary():
+            apply_validator(request, await get_validator(request, queryset, salt=salt))
+            return await self.transform_queryset(queryset)
+
+        async def fetch() -> tuple[Validator | None, Sequence[Any]]:
+            return await get_validator(request, queryset, salt=salt), await self.transform_queryset(queryset)
+
+        validator, page = await self.first_page_cache.get_or_fetch(queryset_cache_key(queryset), fetch)
+        apply_validator(request, validator)
+        return page
 
 
 class IDPagination[ResultType: ModelProtocol](EfficientPagination[ResultType]):
@@ -56,10 +178,11 @@ class IDPagination[ResultType: ModelProtocol](EfficientPagination[ResultType]):
     async def apaginate_queryset(
         self, queryset: models.QuerySet[Any], pagination: Input, **params: Any
     ) -> dict[str, Any]:
+        self.register_model(queryset)
         if pagination.to_id is not None:
             queryset = queryset.filter(id__lt=pagination.to_id)
         result_qset = queryset.order_by('-id')[: pagination.per_page]
-        result = await self.transform_queryset(result_qset)
+        result = await self.transform_page(result_qset, params, first_page=pagination.to_id is None)
         return self.get_result(result)
 
 
@@ -84,26 +207,12 @@ class DateIDPagination[ResultType: ModelProtocol](EfficientPagination[ResultType
         last_timestamp: int | None
 
     def get_timestamp(self, item: ResultType) -> int:
-        result = int(getattr(item, self.date_field).timestamp() * 1000000)
-        return result
+        return datetime_to_timestamp(getattr(item, self.date_field))
 
     def filter_to_timestamp(self, qset: models.QuerySet[Any], pagination: Input) -> models.QuerySet[Any]:
         if pagination.to_timestamp is not None:
-            ms = pagination.to_timestamp # timestamp in microseconds
-            to_date = datetime.fromtimestamp(ms//1000000).replace(microsecond=ms%1000000) # to avoid floating point conversion
-            if self.reverse_order:
-                date_filter = Q(**{f'{self.date_field}__gt': to_date})
-                id_filter = Q(
-                    id__gt=pagination.to_id,
-                    **{f'{self.date_field}': to_date},
-                )
-            else:
-                date_filter = Q(**{f'{self.date_field}__lt': to_date})
-                id_filter = Q(
-                    id__lt=pagination.to_id,
-                    **{f'{self.date_field}': to_date},
-                )
-            qset = qset.filter(date_filter | id_filter)
+            to_date = timestamp_to_datetime(pagination.to_timestamp)
+            qset = keyset_filter(qset, self.date_field, to_date, pagination.to_id, after=self.reverse_order)
 
         if self.reverse_order:
             qset = qset.order_by(f'{self.date_field}', 'id')[:pagination.per_page]
@@ -123,7 +232,94 @@ class DateIDPagination[ResultType: ModelProtocol](EfficientPagination[ResultType
     async def apaginate_queryset(
         self, queryset: models.QuerySet[Any], pagination: Input, **params: Any
     ) -> dict[str, Any]:
+        self.register_model(queryset)
         queryset = self.filter_to_timestamp(queryset, pagination)
-        result = await self.transform_queryset(queryset)
+        result = await self.transform_page(queryset, params, first_page=pagination.to_timestamp is None)
         return self.get_result(result)
 
+
+
+
+def release_connections() -> None:
+    """
+    Closes connections of the current thread outside of transactions, pooled connections are returned to the pool
+    """
+    for connection in connections.all(initialized_only=True):
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+class DeltaSyncPagination[ResultType: ModelProtocol](EfficientPagination[ResultType]):
+    """
+    Returns records created (or updated, if date_field is set) after the cursor, from older to newer
+    With wait parameter request is held until the model changes or timeout passes
+    """
+    def __init__(self, *, date_field: str | None = None, **kwargs: Any) -> None:
+        self.date_field = date_field
+        super().__init__(**kwargs)
+        if self.endpoint.model is not None:
+            # Every process publishes changes, including ones that never serve long polls
+            watch_model_changes(self.endpoint.model)
+
+    class Input(PaginationBase.Input):
+        since_id: int | None = None
+        since_updated_at: int | None = None
+        per_page: int = DEFAULT_PER_PAGE
+        wait: float = 0
+
+    class Output(PaginationBase.Output):
+        items: list[ResultType]
+        last_id: int | None
+        last_updated_at: int | None
+
+    def filter_since(self, qset: models.QuerySet[Any], pagination: Input) -> models.QuerySet[Any]:
+        if self.date_field is None:
+            if pagination.since_id is not None:
+                qset = qset.filter(id__gt=pagination.since_id)
+            return qset.order_by('id')[:pagination.per_page]
+        if pagination.since_updated_at is not None:
+            since_date = timestamp_to_datetime(pagination.since_updated_at)
+            qset = keyset_filter(qset, self.date_field, since_date, pagination.since_id, after=True)
+        return qset.order_by(self.date_field, 'id')[:pagination.per_page]
+
+    def get_result(self, result: Sequence[ResultType], pagination: Input) -> dict[str, Any]:
+        if len(result) == 0:
+            # Nothing changed, client keeps the same cursor
+            last_id = pagination.since_id
+            last_updated_at = pagination.since_updated_at
+        else:
+            last_id = result[-1].id
+            last_updated_at = None
+            if self.date_field is not None:
+                last_updated_at = datetime_to_timestamp(getattr(result[-1], self.date_field))
+        return {
+            'items': result,
+            'count': len(result),
+            'last_id': last_id,
+            'last_updated_at': last_updated_at,
+        }
+
+    def get_wait_timeout(self, pagination: Input) -> float:
+        max_timeout = getattr(settings, 'LONG_POLL_MAX_TIMEOUT', DEFAULT_LONG_POLL_MAX_TIMEOUT)
+        return max(0, min(pagination.wait, max_timeout))
+
+    async def apaginate_queryset(
+        self, queryset: models.QuerySet[Any], pagination: Input, **params: Any
+    ) -> dict[str, Any]:
+        self.register_model(queryset)
+        timeout = self.get_wait_timeout(pagination)
+        page_qset = self.filter_since(queryset, pagination)
+        if timeout == 0:
+            return self.get_result(await self.transform_queryset(page_qset), pagination)
+
+        watch_model_changes(queryset.model)
+        notifier = get_notifier()
+        # Subscribe before the query, so change committed in between wakes us up
+        event = await notifier.asubscribe(get_model_channel(queryset.model))
+        result = await self.transform_queryset(page_qset)
+        if len(result) == 0:
+            # Idle long poll should not hold pooled connection, it is acquired again for the query after wake up
+            await sync_to_async(release_connections)()
+            if await notifier.wait(event, timeout):
+                result = await self.transform_queryset(page_qset)
+        return self.get_result(result, pagination)
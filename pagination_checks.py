@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from typing import Any, Sequence
+from django.core import checks
+from django.db import connections, models
+from django.urls import get_resolver
+from django_utils.pagination import PAGINATED_ENDPOINTS, PaginatedEndpoint
+
+
+@dataclass(kw_only=True, slots=True, frozen=True)
+class MissingIndex:
+    url: str | None
+    model: type[models.Model]
+    columns: tuple[str, ...]
+    ddl: str
+
+
+def get_required_columns(endpoint: PaginatedEndpoint) -> tuple[str, ...] | None:
+    """
+    Columns that keyset pagination of the endpoint filters and orders by
+    None if required index can not be determined, e.g. date field is on related model
+    """
+    if endpoint.model is None:
+        return None
+    pk_column = endpoint.model._meta.pk.column # type: ignore
+    if endpoint.date_field is None:
+        return (pk_column,)
+    if '__' in endpoint.date_field:
+        return None
+    date_column = endpoint.model._meta.get_field(endpoint.date_field).column # type: ignore
+    return (date_column, pk_column)
+
+
+def get_index_columns(model: type[models.Model], using: str) -> list[Sequence[str]]:
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    return [
+        constraint['columns'] for constraint in constraints.values()
+        if constraint['index'] or constraint['primary_key'] or constraint['unique']
+    ]
+
+
+def get_index_ddl(model: type[models.Model], columns: tuple[str, ...], using: str) -> str:
+    quote_name = connections[using].ops.quote_name
+    table = model._meta.db_table
+    index_name = f'{table}_{"_".join(columns)}_idx'[:63]
+    column_list = ', '.join(quote_name(column) for column in columns)
+    return f'CREATE INDEX CONCURRENTLY {quote_name(index_name)} ON {quote_name(table)} ({column_list});'
+
+
+def find_unchecked_endpoints(endpoints: list[PaginatedEndpoint] | None = None) -> list[PaginatedEndpoint]:
+    """
+    Endpoints declared without model= or ordered by related field, their indexes can't be verified
+    """
+    return [
+        endpoint for endpoint in (PAGINATED_ENDPOINTS if endpoints is None else endpoints)
+        if get_required_columns(endpoint) is None
+    ]
+
+
+def find_missing_indexes(
+    endpoints: list[PaginatedEndpoint] | None = None, using: str = 'default'
+) -> list[MissingIndex]:
+    """
+    Checks that every paginated endpoint has index starting with its keyset columns
+    """
+    result: list[MissingIndex] = []
+    checked: set[tuple[Any, ...]] = set()
+    for endpoint in PAGINATED_ENDPOINTS if endpoints is None else endpoints:
+        columns = get_required_columns(endpoint)
+        if columns is None or endpoint.model is None or (endpoint.model, columns) in checked:
+            continue
+        checked.add((endpoint.model, columns))
+        indexes = get_index_columns(endpoint.model, using)
+        if any(tuple(index[:len(columns)]) == columns for index in indexes):
+            continue
+        result.append(MissingIndex(
+            url=endpoint.url,
+            model=endpoint.model,
+            columns=columns,
+            ddl=get_index_ddl(endpoint.model, columns, using),
+        ))
+    return result
+
+
+def check_pagination_indexes(app_configs: Any = None, databases: Sequence[str] | None = None, **kwargs: Any) -> list[checks.CheckMessage]:
+    """
+    Registered by DjangoUtilsConfig, runs with manage.py check --database default
+    Endpoints are registered on import, so url configuration is loaded first
+    """
+    if not databases:
+        return []
+    get_resolver().url_patterns
+    messages: list[checks.CheckMessage] = [
+        checks.Warning(
+            f'Paginated endpoint {endpoint.url} can not be checked for index',
+            hint='Pass model= to the endpoint declaration, date field on related model is not supported',
+            id='django_utils.W002',
+        )
+        for endpoint in find_unchecked_endpoints()
+    ]
+    for using in databases:
+        for missing in find_missing_indexes(using=using):
+            messages.append(checks.Warning(
+                f'Paginated endpoint {missing.url} has no index on ({", ".join(missing.columns)})',
+                hint=missing.ddl,
+                obj=missing.model,
+                id='django_utils.W001',
+            ))
+    return messages
@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+from typing import Any, Callable
+from django.conf import settings
+from django.core.cache import caches
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AbstractBaseUser
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.http import HttpRequest, HttpResponse
+from ninja.errors import HttpError
+from django_utils.schema import AuthData
+from django_utils.user_cache import aget_cached_user
+from django_utils.view_helpers import wrap_view, ViewCall
+import time
+
+PERMISSIONS_VERSION_KEY_PREFIX = 'django_utils:permissions_version:'
+
+
+def get_permissions_cache() -> Any:
+    """
+    Versions should be stored in a cache shared between processes, PERMISSIONS_CACHE is the name of django cache
+    """
+    return caches[getattr(settings, 'PERMISSIONS_CACHE', 'default')]
+
+
+def get_permissions_version_key(user_id: Any) -> str:
+    return f'{PERMISSIONS_VERSION_KEY_PREFIX}{user_id}'
+
+
+async def aget_permissions_version(user_id: Any) -> int | None:
+    """
+    None if version is unknown, e.g. evicted or cache restarted, claims of any token are not trusted then
+    """
+    return await get_permissions_cache().aget(get_permissions_version_key(user_id))
+
+
+async def aget_or_create_permissions_version(user_id: Any) -> int:
+    """
+    Missing version is created with a new value, so it never matches tokens issued before eviction
+    """
+    cache = get_permissions_cache()
+    key = get_permissions_version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        # add keeps the version set concurrently by bump or another token issue
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version if version is not None else 0
+
+
+def bump_permissions_version(user_id: Any) -> None:
+    """
+    Claims issued before the bump are ignored and permissions are checked against the user
+    """
+    get_permissions_cache().set(get_permissions_version_key(user_id), time.time_ns(), None)
+
+
+async def aget_user_claims(user: Any) -> dict[str, Any]:
+    """
+    Compact claims embedded into access token
+    """
+    groups = [name async for name in user.groups.values_list('name', flat=True)]
+    return {
+        'su': user.is_superuser,
+        'st': user.is_staff,
+        'groups': groups,
+        'pv': await aget_or_create_permissions_version(user.pk),
+    }
+
+
+async def aget_auth_data_from_claims(payload: dict[str, Any]) -> AuthData:
+    """
+    Claims are used only if permissions version in the token is current, unknown version is never current
+    """
+    user_id = payload['user_id']
+    version = await aget_permissions_version(user_id)
+    if version is None or 'pv' not in payload or payload['pv'] != version:
+        return AuthData(user_id=user_id)
+    return AuthData(
+        user_id=user_id,
+        is_superuser=payload.get('su'),
+        is_staff=payload.get('st'),
+        groups=tuple(payload['groups']) if 'groups' in payload else None,
+    )
+
+
+@dataclass(kw_only=True, slots=True, frozen=True)
+class PermissionRequirement:
+    superuser: bool = False
+    staff: bool = False
+    groups: tuple[str, ...] = ()
+
+    def check_claims(self, auth: AuthData) -> bool | None:
+        """
+        None if claims required for the check are missing
+        """
+        if auth.is_superuser:
+            return True
+        if self.superuser:
+            return auth.is_superuser
+        if self.staff and not auth.is_staff:
+            return None if auth.is_staff is None else False
+        if self.groups:
+            if auth.groups is None:
+                return None
+            return any(group in auth.groups for group in self.groups)
+        return True
+
+    async def acheck_user(self, user: AbstractBaseUser) -> bool:
+        if not user.is_active: # type: ignore
+            return False
+        if user.is_superuser: # type: ignore
+            return True
+        if self.superuser or (self.staff and not user.is_staff): # type: ignore
+            return False
+        if self.groups:
+            return await user.groups.filter(name__in=self.groups).aexists() # type: ignore
+        return True
+
+
+async def has_permission(auth: Any, requirement: PermissionRequirement) -> bool:
+    if not isinstance(auth, AuthData):
+        return False
+    result = requirement.check_claims(auth)
+    if result is not None:
+        return result
+    user = await aget_cached_user(auth.user_id)
+    return user is not None and await requirement.acheck_user(user)
+
+
+def permission_required(func: Callable[..., Any], requirement: PermissionRequirement) -> Callable[..., Any]:
+    """
+    Checks requirement against claims in AuthData, user is loaded only if claims are missing or outdated
+    """
+    async def handler(call: ViewCall, request: HttpRequest, response: HttpResponse) -> Any:
+        if not await has_permission(getattr(request, 'auth', None), requirement):
+            raise HttpError(403, 'Forbidden')
+        return await call()
+
+    return wrap_view(func, handler)
+
+
+def on_user_saved(sender: Any, instance: Any, **kwargs: Any) -> None:
+    bump_permissions_version(instance.pk)
+
+
+def on_user_relations_changed(sender: Any, instance: Any, action: str, reverse: bool, pk_set: Any, **kwargs: Any) -> None:
+    user_model = get_user_model()
+    relation_fields = [user_model._meta.get_field('groups'), user_model._meta.get_field('user_permissions')]
+    field: Any = next((field for field in relation_fields if field.remote_field.through is sender), None)
+    if field is None:
+        return
+    if not reverse:
+        if action.startswith('post_'):
+            bump_permissions_version(instance.pk)
+        return
+    # Group or permission side of the relation, pk_set contains users except on clear
+    if action == 'pre_clear':
+        user_ids = sender._default_manager.filter(
+            **{field.m2m_reverse_field_name(): instance.pk}
+        ).values_list(field.m2m_field_name(), flat=True)
+    elif action in ('post_add', 'post_remove'):
+        user_ids = pk_set
+    else:
+        return
+    for user_id in user_ids:
+        bump_permissions_version(user_id)
+
+
+post_save.connect(on_user_saved, sender=settings.AUTH_USER_MODEL, dispatch_uid='django_utils_permissions_save')
+post_delete.connect(on_user_saved, sender=settings.AUTH_USER_MODEL, dispatch_uid='django_utils_permissions_delete')
+m2m_changed.connect(on_user_relations_changed, dispatch_uid='django_utils_permissions_relations')
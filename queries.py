@@ -1,11 +1,13 @@
 from collections import defaultdict
+from contextlib import contextmanager
 from dataclasses import fields, is_dataclass
 from dataclasses import _MISSING_TYPE # type: ignore
 from functools import reduce
-from typing import Any, Sequence, Type, TypeVar, get_args, Callable
+from typing import Any, Iterator, Sequence, Type, TypeVar, get_args, Callable
 from ninja import Body
 from enum import Enum
 from inspect import isclass
+import time
 
 from django.core.files.storage import default_storage
 from django.db import models
@@ -16,6 +18,8 @@ from django_utils.schema import (
     DataclassProtocol, ResultType, FieldName
 )
 from django_utils.helpers import base64_to_file
+from django_utils.timing import timed, count
+from django_utils.metrics import Counter, Histogram, SIZE_BUCKETS
 from django_utils.queries_helpers import (
     is_json_schema_dict, is_json_schema_list, remove_optional_from_type,
     is_json_schema, is_url_field, is_file_field, is_external_field
@@ -26,6 +30,13 @@ ModelType = TypeVar('ModelType', bound=models.Model)
 ResultType = TypeVar('ResultType', bound=DataclassProtocol)
 
 
+typed_data_rows = Counter('typed_data_rows', 'Rows fetched by typed data queries', labelnames=('schema',))
+typed_data_decode_seconds = Histogram(
+    'typed_data_decode_seconds', 'Time spent decoding rows into dataclasses', labelnames=('schema',)
+)
+bulk_create_rows = Histogram('bulk_create_rows', 'Objects per bulk create call', buckets=SIZE_BUCKETS, labelnames=('model',))
+
+
 def dict_from_dataclass(obj: DataclassProtocol) -> dict[str, Any]:
     """
     Converts nested dataclass object to regular python dictionary
@@ -74,7 +85,8 @@ def dataclass_from_model_instance(instance: models.Model, type_class: Type[Resul
             if field_data.name is None:
                 kw[field.name] = None
             else:
-                kw[field.name] = default_storage.url(field_data.name)
+                with timed('sign_url'):
+                    kw[field.name] = default_storage.url(field_data.name)
         else:
             kw[field.name] = field_data
     return type_class(**kw)
@@ -97,6 +109,7 @@ async def bulk_create_wrapper(
     batch_size: int = 100,
 ) -> list[ModelType]:
     # Wrapper is necessary for compatibility with different DB backends
+    bulk_create_rows.labels(model.__name__).observe(len(objs_to_create))
     return await model.objects.abulk_create(
         objs_to_create,
         batch_size=batch_size,
@@ -230,7 +243,8 @@ def convert_field_to_json(field_data: Any, field_type: Any) -> Any:
         return field_type(field_data)
     elif is_url_field(field_type):
         if (field_data):
-            return default_storage.url(field_data)
+            with timed('sign_url'):
+                return default_storage.url(field_data)
         else:
             return ''
     else:
@@ -316,6 +330,21 @@ async def get_typed_data(
     return qset.values(*result_names)
 
 
+@contextmanager
+def measure_decode(type_class: type, rows: int) -> Iterator[None]:
+    """
+    Records fetched rows and decoding time per schema in request timings and process metrics
+    """
+    count('rows', rows)
+    typed_data_rows.labels(type_class.__name__).inc(rows)
+    started = time.perf_counter()
+    try:
+        with timed('decode'):
+            yield
+    finally:
+        typed_data_decode_seconds.labels(type_class.__name__).observe(time.perf_counter() - started)
+
+
 async def typed_data_dict(
     qset: models.QuerySet[Any],
     type_class: Type[ResultType],
@@ -323,11 +352,13 @@ async def typed_data_dict(
     related_field: FieldName | None = None,
 ) -> FlatDict[ResultType]:
     typed_data = await get_typed_data(type_class, qset, (key_field,), related_field)
+    rows = [row async for row in typed_data]
     result: dict[ResultKey, ResultType] = {}
-    async for row in typed_data:
-        obj = get_obj_from_values(type_class, row, related_field=related_field)
-        key = row[key_field if related_field is None else f"{related_field}__{key_field}"]
-        result[key] = obj
+    with measure_decode(type_class, len(rows)):
+        for row in rows:
+            obj = get_obj_from_values(type_class, row, related_field=related_field)
+            key = row[key_field if related_field is None else f"{related_field}__{key_field}"]
+            result[key] = obj
     return result
 
 
@@ -341,12 +372,14 @@ async def nested_typed_data_dict(
     In this case result is two level nested dictionary
     """
     typed_data = await get_typed_data(type_class, qset, key_fields)
+    rows = [row async for row in typed_data]
     result = defaultdict[ResultKey, dict[ResultKey, ResultType]](dict)
-    async for row in typed_data:
-        obj = get_obj_from_values(type_class, row)
-        key = row[key_fields[0]]
-        sub_key = row[key_fields[1]]
-        result[key][sub_key] = obj
+    with measure_decode(type_class, len(rows)):
+        for row in rows:
+            obj = get_obj_from_values(type_class, row)
+            key = row[key_fields[0]]
+            sub_key = row[key_fields[1]]
+            result[key][sub_key] = obj
     return result
 
 
@@ -390,7 +423,25 @@ async def typed_data_list(
     result = await get_typed_data(type_class, qset, field_mapping=field_mapping)
     reverse_mapping = {v: k for k, v in field_mapping.items()}
     mapped_result = [reverse_map(row, reverse_mapping) async for row in result]
-    return [get_obj_from_values(type_class, row) for row in mapped_result]
+    with measure_decode(type_class, len(mapped_result)):
+        return [get_obj_from_values(type_class, row) for row in mapped_result]
+
+
+async def typed_data_first(
+    qset: models.QuerySet[Any],
+    type_class: Type[ResultType],
+) -> tuple[ResultType | None, bool]:
+    """
+    Fetches at most two rows and decodes only the first one
+    Second value is True if queryset matches more than one row
+    """
+    result = await get_typed_data(type_class, qset)
+    rows = [row async for row in result[:2]]
+    if len(rows) == 0:
+        count('rows', 0)
+        return None, False
+    with measure_decode(type_class, len(rows)):
+        return get_obj_from_values(type_class, rows[0]), len(rows) > 1
 
 
 def get_model_data_from_request(request_data: Body[DataclassProtocol], file_name_handler: Callable[[str, Any], str]):
@@ -0,0 +1,142 @@
+from collections import Counter as ShapeCounter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django_utils.db_hooks import register_query_observer
+from django_utils.metrics import Counter
+from django_utils.view_helpers import wrap_view, ViewCall
+import logging
+import random
+import re
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+DEFAULT_QUERY_BUDGET_SAMPLE_RATE = 0.0
+
+SQL_STRING = re.compile(r"'(?:[^']|'')*'")
+SQL_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+SQL_VALUES_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+query_budget_exceeded = Counter('query_budget_exceeded', 'Sampled requests above query budget', labelnames=('endpoint',))
+query_n_plus_one_suspects = Counter(
+    'query_n_plus_one_suspects', 'Sampled requests with repeated query shapes', labelnames=('endpoint', 'schema')
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def get_sql_shape(sql: str) -> str:
+    """
+    SQL with literals and parameters replaced, IN lists of any length have the same shape
+    """
+    shape = SQL_STRING.sub('?', sql).replace('%s', '?')
+    shape = SQL_NUMBER.sub('?', shape)
+    return SQL_VALUES_LIST.sub('(...)', shape)
+
+
+@dataclass(slots=True, kw_only=True)
+class QueryRecorder:
+    """
+    Queries executed while recorder is active, shapes are computed only when recorder is inspected
+    """
+    name: str = ''
+    schema: str | None = None
+    queries: list[str] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    def repeated_shapes(self, threshold: int | None = None) -> list[tuple[str, int]]:
+        if threshold is None:
+            threshold = getattr(settings, 'N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+        shapes = ShapeCounter(get_sql_shape(sql) for sql in self.queries)
+        return [(shape, amount) for shape, amount in shapes.most_common() if amount >= threshold]
+
+    def describe(self, max_queries: int | None = None) -> str:
+        lines = [f'{self.name or "Block"} executed {self.count} queries']
+        if max_queries is not None:
+            lines[0] += f', budget is {max_queries}'
+        if self.schema is not None:
+            lines[0] += f' (schema {self.schema})'
+        lines += [f'{amount}x {shape}' for shape, amount in self.repeated_shapes()]
+        return '\n'.join(lines)
+
+
+active_recorders: ContextVar[tuple[QueryRecorder, ...]] = ContextVar('django_utils_query_recorders', default=())
+
+
+def record_query(sql: str, duration: float, rows: int | None) -> None:
+    for recorder in active_recorders.get():
+        recorder.queries.append(sql)
+
+
+register_query_observer(record_query)
+
+
+@contextmanager
+def query_budget(max_queries: int | None = None, name: str = '', schema: str | None = None) -> Iterator[QueryRecorder]:
+    """
+    Records queries executed in the block, including ones executed by async ORM in worker threads
+    Raises QueryBudgetExceeded when the block executes more than max_queries, e.g.
+    with query_budget(2):
+        await typed_data_list(qset, ItemData)
+    """
+    recorder = QueryRecorder(name=name, schema=schema)
+    token = active_recorders.set((*active_recorders.get(), recorder))
+    try:
+        yield recorder
+    finally:
+        active_recorders.reset(token)
+    if max_queries is not None and recorder.count > max_queries:
+        raise QueryBudgetExceeded(recorder.describe(max_queries))
+
+
+def is_query_budget_strict() -> bool:
+    return getattr(settings, 'QUERY_BUDGET_RAISE', False)
+
+
+def get_query_budget_sample_rate() -> float:
+    return getattr(settings, 'QUERY_BUDGET_SAMPLE_RATE', DEFAULT_QUERY_BUDGET_SAMPLE_RATE)
+
+
+def report_queries(recorder: QueryRecorder, max_queries: int | None) -> None:
+    endpoint = recorder.name
+    if max_queries is not None and recorder.count > max_queries:
+        query_budget_exceeded.labels(endpoint).inc()
+        logger.warning('Query budget exceeded: %s', recorder.describe(max_queries))
+    for shape, amount in recorder.repeated_shapes():
+        query_n_plus_one_suspects.labels(endpoint, recorder.schema or '').inc()
+        logger.warning('Suspected N+1 in %s (schema %s): %d queries of shape %s', endpoint, recorder.schema, amount, shape)
+
+
+def query_budgeted(
+    func: Callable[..., Any], url: str, max_queries: int | None = None, schema: str | None = None
+) -> Callable[..., Any]:
+    """
+    With QUERY_BUDGET_RAISE (test settings) every request is recorded and exceeded budget raises QueryBudgetExceeded
+    Otherwise QUERY_BUDGET_SAMPLE_RATE share of requests is recorded, exceeded budget and repeated query shapes are logged
+    """
+    async def handler(call: ViewCall, request: HttpRequest, response: HttpResponse) -> Any:
+        strict = is_query_budget_strict()
+        if not strict and random.random() >= get_query_budget_sample_rate():
+            return await call()
+        with query_budget(max_queries if strict else None, name=url, schema=schema) as recorder:
+            result = await call()
+        report_queries(recorder, max_queries)
+        return result
+
+    return wrap_view(func, handler)
+
+
+def is_query_budget_enabled(max_queries: int | None) -> bool:
+    """
+    Views are wrapped only if they can be recorded, settings are read at declaration time
+    """
+    return max_queries is not None or is_query_budget_strict() or get_query_budget_sample_rate() > 0
@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Iterable, Type
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from django_utils.cache import SingleFlight
+from django_utils.metrics import Counter
+import hashlib
+import math
+import time
+
+DEFAULT_REVOCATION_REFRESH_INTERVAL = 60
+DEFAULT_REVOCATION_REBUILD_INTERVAL = 3600
+DEFAULT_BLOOM_FALSE_POSITIVE_RATE = 0.001
+MIN_BLOOM_CAPACITY = 1024
+# Late committed rows and clock differences between processes
+REVOCATION_OVERLAP = timedelta(seconds=30)
+
+revocation_filter_negatives = Counter('revocation_filter_negatives', 'Tokens resolved as not revoked by the filter')
+revocation_db_checks = Counter('revocation_db_checks', 'Filter matches checked in the database')
+
+
+class BloomFilter:
+    """
+    Set membership with false positives but without false negatives
+    """
+    def __init__(self, capacity: int, false_positive_rate: float = DEFAULT_BLOOM_FALSE_POSITIVE_RATE) -> None:
+        capacity = max(capacity, MIN_BLOOM_CAPACITY)
+        self.size = math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # Double hashing, two 64 bit halves of one digest produce all positions
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+def get_revoked_token_model() -> Type[models.Model] | None:
+    """
+    Concrete subclass of BaseRevokedToken, revocation is disabled if REVOKED_TOKEN_MODEL is not set
+    """
+    model_name = getattr(settings, 'REVOKED_TOKEN_MODEL', None)
+    if model_name is None:
+        return None
+    return apps.get_model(model_name)
+
+
+class RevocationFilter:
+    """
+    In-memory filter of revoked token ids
+    New revocations are loaded incrementally every REVOCATION_REFRESH_INTERVAL seconds,
+    filter is rebuilt from scratch every REVOCATION_REBUILD_INTERVAL to drop expired tokens and resize
+    Tokens revoked by other processes are visible after the next refresh
+    """
+    def __init__(self) -> None:
+        self.bloom: BloomFilter | None = None
+        self.last_seen: datetime | None = None
+        self.refreshed_at = 0.0
+        self.rebuilt_at = 0.0
+        self.flight = SingleFlight[None]()
+
+    async def rebuild(self, model: Type[models.Model]) -> None:
+        now = timezone.now()
+        qset = model._default_manager.filter(expires_at__gt=now) # type: ignore
+        bloom = BloomFilter(await qset.acount() * 2)
+        last_seen = None
+        async for jti, revoked_at in qset.values_list('jti', 'revoked_at'):
+            bloom.add(jti)
+            last_seen = revoked_at if last_seen is None else max(last_seen, revoked_at)
+        self.bloom = bloom
+        self.last_seen = last_seen or now
+        self.rebuilt_at = self.refreshed_at = time.monotonic()
+
+    async def load_new(self, model: Type[models.Model]) -> None:
+        assert self.bloom is not None and self.last_seen is not None
+        # Recent rows are loaded again, adding to the filter is idempotent
+        qset = model._default_manager.filter(revoked_at__gte=self.last_seen - REVOCATION_OVERLAP) # type: ignore
+        async for jti, revoked_at in qset.values_list('jti', 'revoked_at'):
+            self.bloom.add(jti)
+            self.last_seen = max(self.last_seen, revoked_at)
+        self.refreshed_at = time.monotonic()
+
+    async def refresh(self, model: Type[models.Model]) -> None:
+        now = time.monotonic()
+        rebuild_interval = getattr(settings, 'REVOCATION_REBUILD_INTERVAL', DEFAULT_REVOCATION_REBUILD_INTERVAL)
+        refresh_interval = getattr(settings, 'REVOCATION_REFRESH_INTERVAL', DEFAULT_REVOCATION_REFRESH_INTERVAL)
+        if self.bloom is None or now - self.rebuilt_at > rebuild_interval:
+            await self.flight.do('rebuild', lambda: self.rebuild(model))
+        elif now - self.refreshed_at > refresh_interval:
+            await self.flight.do('load_new', lambda: self.load_new(model))
+
+    async def is_revoked(self, jti: str) -> bool:
+        model = get_revoked_token_model()
+        if model is None:
+            return False
+        await self.refresh(model)
+        assert self.bloom is not None
+        if jti not in self.bloom:
+            revocation_filter_negatives.inc()
+            return False
+        revocation_db_checks.inc()
+        return await model._default_manager.filter(jti=jti).aexists() # type: ignore
+
+    def add(self, jti: str) -> None:
+        if self.bloom is not None:
+            self.bloom.add(jti)
+
+
+revocation_filter = RevocationFilter()
+
+
+async def is_token_revoked(payload: dict[str, Any]) -> bool:
+    """
+    Tokens issued without jti can't be revoked
+    """
+    jti = payload.get('jti')
+    if jti is None:
+        return False
+    return await revocation_filter.is_revoked(jti)
+
+
+async def revoke_token(payload: dict[str, Any]) -> None:
+    model = get_revoked_token_model()
+    jti = payload.get('jti')
+    if model is None or jti is None:
+        return
+    await model._default_manager.aget_or_create( # type: ignore
+        jti=jti,
+        defaults={
+            'user_id': payload['user_id'],
+            'expires_at': datetime.fromtimestamp(payload['exp'], tz=dt_timezone.utc),
+        },
+    )
+    revocation_filter.add(jti)
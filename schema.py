@@ -55,6 +55,10 @@ Decorator = Callable[[Callable[..., Any]], Callable[..., Any]]
 @dataclass(kw_only=True, slots=True, frozen=True)
 class AuthData:
     user_id: IdType
+    # Claims from access token, None if they are unknown or outdated
+    is_superuser: bool | None = None
+    is_staff: bool | None = None
+    groups: tuple[str, ...] | None = None
 
 
 Base64FileAnnotation = 'Base64FILE'
@@ -18,4 +18,67 @@ def config_get_str(key: str, default: str | None = None, warning: str | None = N
             raise ValueError(f'No environment var {key}')
         else:
             return default
-    return value
\ No newline at end of file
+    return value
+
+def config_get_int(key: str, default: int, min_value: int | None = None, max_value: int | None = None) -> int:
+    value = os.environ.get(key)
+    if value is None or value == '':
+        result = default
+    else:
+        try:
+            result = int(value)
+        except ValueError:
+            raise ValueError(f'Environment var {key} should be integer, got {value!r}')
+    if min_value is not None and result < min_value:
+        raise ValueError(f'Environment var {key} should be at least {min_value}, got {result}')
+    if max_value is not None and result > max_value:
+        raise ValueError(f'Environment var {key} should be at most {max_value}, got {result}')
+    return result
+
+def config_get_float(key: str, default: float, min_value: float | None = None) -> float:
+    value = os.environ.get(key)
+    if value is None or value == '':
+        result = default
+    else:
+        try:
+            result = float(value)
+        except ValueError:
+            raise ValueError(f'Environment var {key} should be number, got {value!r}')
+    if min_value is not None and result < min_value:
+        raise ValueError(f'Environment var {key} should be at least {min_value}, got {result}')
+    return result
+
+def config_pool_options(min_size: int = 2, max_size: int = 4, timeout: float = 10) -> dict[str, int | float]:
+    """
+    psycopg pool options from DATABASE_POOL_* environment vars, arguments are defaults
+    """
+    options: dict[str, int | float] = {
+        "min_size": config_get_int('DATABASE_POOL_MIN_SIZE', min_size, min_value=0),
+        "max_size": config_get_int('DATABASE_POOL_MAX_SIZE', max_size, min_value=1),
+        "timeout": config_get_float('DATABASE_POOL_TIMEOUT', timeout, min_value=0.1),
+        "max_lifetime": config_get_float('DATABASE_POOL_MAX_LIFETIME', 3600, min_value=1),
+        "max_idle": config_get_float('DATABASE_POOL_MAX_IDLE', 600, min_value=1),
+    }
+    if options["min_size"] > options["max_size"]:
+        raise ValueError(
+            f'DATABASE_POOL_MIN_SIZE ({options["min_size"]}) is greater than DATABASE_POOL_MAX_SIZE ({options["max_size"]})'
+        )
+    return options
+
+def config_pool_autotune(max_size: int) -> dict[str, str | int | float]:
+    """
+    Pool auto tuning from DATABASE_POOL_AUTOTUNE_* environment vars
+    mode is off, recommend (only reported) or adjust (pool is resized), max_size stays within bounds
+    """
+    mode = config_get_str('DATABASE_POOL_AUTOTUNE', default='off')
+    if mode not in ('off', 'recommend', 'adjust'):
+        raise ValueError(f'DATABASE_POOL_AUTOTUNE should be off, recommend or adjust, got {mode!r}')
+    lower = config_get_int('DATABASE_POOL_AUTOTUNE_MIN', max_size, min_value=1)
+    upper = config_get_int('DATABASE_POOL_AUTOTUNE_MAX', max_size * 2, min_value=lower)
+    return {
+        "mode": mode,
+        "min_max_size": lower,
+        "max_max_size": upper,
+        "wait_threshold": config_get_float('DATABASE_POOL_AUTOTUNE_WAIT', 0.005, min_value=0),
+        "interval": config_get_float('DATABASE_POOL_AUTOTUNE_INTERVAL', 60, min_value=1),
+    }
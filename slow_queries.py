@@ -0,0 +1,304 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any, Callable, Iterator
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.http import HttpRequest, HttpResponse
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from django_utils.db_hooks import register_execute_wrapper
+from django_utils.metrics import Counter
+from django_utils.view_helpers import wrap_view, ViewCall
+import os
+import queue
+import random
+import threading
+import time
+import weakref
+
+DEFAULT_SLOW_QUERY_THRESHOLD = 0.2
+DEFAULT_SLOW_QUERY_BUFFER_SIZE = 200
+DEFAULT_SLOW_QUERY_EXPLAIN_RATE = 0.1
+EXPLAIN_QUEUE_SIZE = 20
+MAX_SLOW_QUERY_SQL_LENGTH = 10000
+EXPLAINABLE_STATEMENTS = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+QUERY_CANCELED_SQLSTATE = '57014'
+
+slow_queries_total = Counter('slow_queries', 'Queries above SLOW_QUERY_THRESHOLD', labelnames=('database',))
+cancelled_queries_total = Counter('cancelled_queries', 'Queries cancelled by statement timeout', labelnames=('database',))
+
+statement_timeout_override: ContextVar[float | None] = ContextVar('django_utils_statement_timeout', default=None)
+
+# Session statement_timeout in milliseconds set by override, keyed by DB-API connection, so it follows pooled connection
+_session_timeouts: weakref.WeakKeyDictionary[Any, int] = weakref.WeakKeyDictionary()
+# SET LOCAL of the current transaction, valid while its on_commit marker is pending (dropped on commit and rollback)
+_local_timeouts: weakref.WeakKeyDictionary[Any, tuple[Callable[[], None], int | None]] = weakref.WeakKeyDictionary()
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class SlowQuery:
+    sql: str
+    params_shape: str
+    duration: float
+    database: str
+    cancelled: bool
+    recorded_at: datetime
+    plan: list[Any] | None = None
+
+
+_slow_queries: deque[SlowQuery] | None = None
+_slow_queries_lock = threading.Lock()
+
+
+def get_slow_queries() -> deque[SlowQuery]:
+    """
+    Bounded buffer of recent slow queries of the current process, oldest are dropped first
+    """
+    global _slow_queries
+    if _slow_queries is None:
+        _slow_queries = deque(maxlen=getattr(settings, 'SLOW_QUERY_BUFFER_SIZE', DEFAULT_SLOW_QUERY_BUFFER_SIZE))
+    return _slow_queries
+
+
+def set_query_plan(query: SlowQuery, plan: list[Any]) -> None:
+    with _slow_queries_lock:
+        queries = get_slow_queries()
+        for index, recorded in enumerate(queries):
+            if recorded is query:
+                queries[index] = replace(query, plan=plan)
+                return
+
+
+@contextmanager
+def statement_timeout(seconds: float) -> Iterator[None]:
+    """
+    Overrides statement_timeout of PostgreSQL queries executed in the block, including async ORM queries
+    Outside of transaction it is set for the session and reset when the block exits,
+    inside of transaction it is set once with SET LOCAL until the end of that transaction
+    """
+    token = statement_timeout_override.set(seconds)
+    try:
+        yield
+    finally:
+        statement_timeout_override.reset(token)
+        if statement_timeout_override.get() is None:
+            reset_session_timeouts()
+
+
+def with_statement_timeout(func: Callable[..., Any], seconds: float) -> Callable[..., Any]:
+    async def handler(call: ViewCall, request: HttpRequest, response: HttpResponse) -> Any:
+        try:
+            with statement_timeout(seconds):
+                return await call()
+        finally:
+            # Async ORM connections live in the sync thread of the request
+            if _session_timeouts and statement_timeout_override.get() is None:
+                await sync_to_async(reset_session_timeouts)()
+
+    return wrap_view(func, handler)
+
+
+def set_statement_timeout(connection: Any, milliseconds: int | None, local: bool) -> None:
+    # SET does not accept bind parameters, value is always formatted from int
+    value = 'DEFAULT' if milliseconds is None else str(milliseconds)
+    with connection.connection.cursor() as cursor:
+        cursor.execute(f'SET {"LOCAL " if local else ""}statement_timeout TO {value}')
+
+
+def reset_session_timeouts() -> None:
+    """
+    Resets session statement_timeout of connections of the current thread, so pooled connections are returned clean
+    Connections inside of transaction are reset by their next query
+    """
+    if not _session_timeouts:
+        return
+    for connection in connections.all(initialized_only=True):
+        raw_connection = connection.connection
+        if raw_connection is None or raw_connection not in _session_timeouts or connection.in_atomic_block:
+            continue
+        set_statement_timeout(connection, None, local=False)
+        del _session_timeouts[raw_connection]
+
+
+def get_local_timeout(connection: Any) -> tuple[bool, int | None]:
+    """
+    (is set, milliseconds) of SET LOCAL in the current transaction
+    """
+    marker, milliseconds = _local_timeouts.get(connection.connection, (None, None))
+    if marker is None or not any(callback is marker for _, callback, *_ in connection.run_on_commit):
+        return False, None
+    return True, milliseconds
+
+
+def set_local_timeout(connection: Any, milliseconds: int | None) -> None:
+    set_statement_timeout(connection, milliseconds, local=True)
+
+    def marker() -> None:
+        pass
+
+    # Rollback of the transaction or savepoint discards both SET LOCAL and the marker
+    connection.on_commit(marker)
+    _local_timeouts[connection.connection] = (marker, milliseconds)
+
+
+def apply_statement_timeout(execute: Callable[..., Any], sql: str, params: Any, many: bool, context: dict[str, Any]) -> Any:
+    """
+    Round trip is made only when the timeout of the connection or the transaction changes
+    Outside of transactions session SET is used, SET LOCAL would last only for the autocommitted statement
+    """
+    seconds = statement_timeout_override.get()
+    if seconds is None and not _session_timeouts:
+        return execute(sql, params, many, context)
+    connection = context['connection']
+    if connection.vendor != 'postgresql':
+        return execute(sql, params, many, context)
+    milliseconds = None if seconds is None else int(seconds * 1000)
+    session_timeout = _session_timeouts.get(connection.connection)
+    if connection.in_atomic_block:
+        is_local, local_timeout = get_local_timeout(connection)
+        if (local_timeout if is_local else session_timeout) != milliseconds:
+            set_local_timeout(connection, milliseconds)
+    elif milliseconds != session_timeout:
+        set_statement_timeout(connection, milliseconds, local=False)
+        if milliseconds is None:
+            del _session_timeouts[connection.connection]
+        else:
+            _session_timeouts[connection.connection] = milliseconds
+    return execute(sql, params, many, context)
+
+
+def get_params_shape(params: Any, many: bool = False) -> str:
+    """
+    Types of parameters without values, values can contain personal data
+    """
+    if params is None:
+        return ''
+    if many:
+        # Iterator of parameter rows is already consumed by executemany
+        if isinstance(params, (list, tuple)) and params:
+            return f'{len(params)} x {get_params_shape(params[0])}'
+        return 'many'
+    if isinstance(params, dict):
+        return ', '.join(f'{name}: {type(value).__name__}' for name, value in params.items())
+    shapes = []
+    for value in params:
+        if isinstance(value, (list, tuple)):
+            shapes.append(f'{type(value).__name__}[{len(value)}]')
+        else:
+            shapes.append(type(value).__name__)
+    return ', '.join(shapes)
+
+
+def is_query_cancelled(error: BaseException) -> bool:
+    cause = error.__cause__
+    return QUERY_CANCELED_SQLSTATE in (getattr(cause, 'sqlstate', None), getattr(cause, 'pgcode', None))
+
+
+def explain_query(connection: Any, sql: str, params: Any) -> list[Any] | None:
+    """
+    Plan without execution, only outside of transactions, so failed EXPLAIN can't abort the caller's transaction
+    """
+    if connection.vendor != 'postgresql' or connection.in_atomic_block:
+        return None
+    if not sql.lstrip().upper().startswith(EXPLAINABLE_STATEMENTS):
+        return None
+    try:
+        connection.ensure_connection()
+        with connection.connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (ANALYZE off, FORMAT JSON) {sql}', params)
+            row = cursor.fetchone()
+    except Exception:
+        return None
+    if row is None:
+        return None
+    plan = row[0]
+    return plan if isinstance(plan, list) else None
+
+
+class Explainer:
+    """
+    Runs EXPLAIN of sampled slow queries in a background thread with its own connection,
+    so the request that ran slow query doesn't wait for the plan
+    Queries above EXPLAIN_QUEUE_SIZE waiting for the plan are recorded without it
+    """
+    def __init__(self) -> None:
+        self._queue: queue.Queue[tuple[SlowQuery, str, Any]] = queue.Queue(maxsize=EXPLAIN_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+
+    def submit(self, query: SlowQuery, sql: str, params: Any) -> None:
+        self.ensure_started()
+        try:
+            self._queue.put_nowait((query, sql, params))
+        except queue.Full:
+            pass
+
+    def ensure_started(self) -> None:
+        # Thread is not inherited by forked workers, each process starts its own
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=EXPLAIN_QUEUE_SIZE)
+            threading.Thread(target=self.explain_forever, args=(self._queue,), name='slow-query-explainer', daemon=True).start()
+
+    def explain_forever(self, pending: queue.Queue[tuple[SlowQuery, str, Any]]) -> None:
+        while True:
+            query, sql, params = pending.get()
+            connection = connections[query.database]
+            try:
+                plan = explain_query(connection, sql, params)
+            finally:
+                # Pooled connection is returned to the pool between plans
+                connection.close()
+            if plan is not None:
+                set_query_plan(query, plan)
+
+
+EXPLAINER = Explainer()
+
+
+def record_slow_query(connection: Any, sql: str, params: Any, many: bool, duration: float, cancelled: bool) -> None:
+    query = SlowQuery(
+        sql=sql[:MAX_SLOW_QUERY_SQL_LENGTH],
+        params_shape=get_params_shape(params, many),
+        duration=duration,
+        database=connection.alias,
+        cancelled=cancelled,
+        recorded_at=timezone.now(),
+    )
+    with _slow_queries_lock:
+        get_slow_queries().append(query)
+    explain_rate = getattr(settings, 'SLOW_QUERY_EXPLAIN_RATE', DEFAULT_SLOW_QUERY_EXPLAIN_RATE)
+    if not many and connection.vendor == 'postgresql' and random.random() < explain_rate:
+        EXPLAINER.submit(query, sql, params)
+    if cancelled:
+        cancelled_queries_total.labels(connection.alias).inc()
+    else:
+        slow_queries_total.labels(connection.alias).inc()
+
+
+def capture_slow_query(execute: Callable[..., Any], sql: str, params: Any, many: bool, context: dict[str, Any]) -> Any:
+    """
+    Records queries above SLOW_QUERY_THRESHOLD seconds and queries cancelled by statement timeout
+    SLOW_QUERY_EXPLAIN_RATE share of them gets the query plan shortly after
+    """
+    started = time.perf_counter()
+    cancelled = False
+    try:
+        return execute(sql, params, many, context)
+    except DatabaseError as error:
+        cancelled = is_query_cancelled(error)
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        if cancelled or duration >= getattr(settings, 'SLOW_QUERY_THRESHOLD', DEFAULT_SLOW_QUERY_THRESHOLD):
+            record_slow_query(context['connection'], sql, params, many, duration, cancelled)
+
+
+# Capture wraps the timeout, so the time of SET is included in the query duration
+register_execute_wrapper(capture_slow_query)
+register_execute_wrapper(apply_statement_timeout)
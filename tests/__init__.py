@@ -0,0 +1,31 @@
+"""
+Settings shared by all test modules, run from the directory containing django_utils:
+python -m unittest discover -s django_utils/tests -t .
+"""
+from django.conf import settings
+import django_stubs_ext
+
+# Generic Django classes are subscripted in annotations, same as in base_settings
+django_stubs_ext.monkeypatch()
+
+if not settings.configured:
+    settings.configure(
+        DATABASES={
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+            'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+        },
+        DATABASE_REPLICAS=['replica'],
+        DATABASE_ROUTERS=['django_utils.db_router.ReplicaRouter'],
+        INSTALLED_APPS=['django.contrib.contenttypes'],
+        SESSION_COOKIE_PATH='/app',
+        SESSION_COOKIE_SECURE=False,
+        USE_TZ=True,
+        JWT_SECRET='test-secret-with-recommended-length-32',
+        JWT_ALGORITHM='HS256',
+        JWT_ACCESS_EXP_DELTA_SECONDS=300,
+        JWT_REFRESH_EXP_DELTA_SECONDS=3600,
+    )
+
+import django
+
+django.setup()
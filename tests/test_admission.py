@@ -0,0 +1,104 @@
+"""
+Admission control, run from the directory containing django_utils:
+python -m unittest django_utils.tests.test_admission
+"""
+from typing import Any
+from unittest import IsolatedAsyncioTestCase, mock
+from django.http import HttpRequest, HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django_utils import admission
+from django_utils.admission import AdmissionGate, Priority, admitted
+import asyncio
+
+
+class AdmissionGateTest(IsolatedAsyncioTestCase):
+    async def test_requests_under_limit_are_admitted(self) -> None:
+        gate = AdmissionGate('test', limit=2)
+        self.assertTrue(await gate.acquire())
+        self.assertTrue(await gate.acquire())
+        self.assertEqual(gate.active, 2)
+
+    async def test_waiter_is_admitted_after_release(self) -> None:
+        gate = AdmissionGate('test', limit=1)
+        await gate.acquire()
+        waiter = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        self.assertEqual(gate.queued, 1)
+        gate.release()
+        self.assertTrue(await waiter)
+        self.assertEqual((gate.active, gate.queued), (1, 0))
+
+    async def test_request_is_shed_when_queue_is_full(self) -> None:
+        gate = AdmissionGate('test', limit=1, max_queue=1)
+        await gate.acquire()
+        waiter = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        self.assertFalse(await gate.acquire())
+        gate.release()
+        self.assertTrue(await waiter)
+
+    async def test_request_is_shed_after_timeout(self) -> None:
+        gate = AdmissionGate('test', limit=1, timeout=0.01)
+        await gate.acquire()
+        self.assertFalse(await gate.acquire())
+        self.assertEqual((gate.active, gate.queued), (1, 0))
+        gate.release()
+        self.assertEqual(gate.active, 0)
+
+    async def test_higher_priority_is_admitted_first(self) -> None:
+        gate = AdmissionGate('test', limit=1)
+        await gate.acquire()
+        order: list[Priority] = []
+
+        async def acquire(priority: Priority) -> None:
+            await gate.acquire(priority)
+            order.append(priority)
+
+        tasks = [asyncio.create_task(acquire(priority)) for priority in (Priority.LOW, Priority.NORMAL, Priority.HIGH)]
+        await asyncio.sleep(0)
+        for _ in tasks:
+            gate.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, [Priority.HIGH, Priority.NORMAL, Priority.LOW])
+
+    async def test_cancelled_waiter_does_not_take_slot(self) -> None:
+        gate = AdmissionGate('test', limit=1)
+        await gate.acquire()
+        waiter = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        gate.release()
+        self.assertEqual((gate.active, gate.queued), (0, 0))
+
+
+@override_settings(ADMISSION_CONTROL={'concurrency': 1, 'max_queue': 0})
+class AdmittedViewTest(SimpleTestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch.object(admission, '_global_gate', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_shed_request_gets_service_unavailable(self) -> None:
+        async def run() -> tuple[Any, Any]:
+            release = asyncio.Event()
+
+            async def view(request: HttpRequest) -> dict[str, bool]:
+                await release.wait()
+                return {'ok': True}
+
+            wrapped = admitted(view, '/slow')
+            request = RequestFactory().get('/slow')
+            first = asyncio.create_task(wrapped(request, temporal_response=HttpResponse()))
+            await asyncio.sleep(0)
+            shed = await wrapped(request, temporal_response=HttpResponse())
+            release.set()
+            return await first, shed
+
+        result, response = asyncio.run(run())
+        self.assertEqual(result, {'ok': True})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '2')
+        self.assertEqual(admission.get_global_gate().active, 0)
@@ -0,0 +1,124 @@
+"""
+In-process caches and single-flight loading, run from the directory containing django_utils:
+python -m unittest django_utils.tests.test_cache
+"""
+from unittest import IsolatedAsyncioTestCase, TestCase
+from django_utils.cache import AsyncCache, SingleFlight, TTLCache
+import asyncio
+import time
+
+
+class TTLCacheTest(TestCase):
+    def test_entry_expires(self) -> None:
+        cache = TTLCache[int](ttl=0.05)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('a'))
+
+    def test_stale_entry_is_returned_as_not_fresh(self) -> None:
+        cache = TTLCache[int](ttl=0.05, stale_ttl=10)
+        cache.set('a', 1)
+        time.sleep(0.1)
+        self.assertEqual(cache.get_entry('a'), (1, False))
+        self.assertIsNone(cache.get('a'))
+
+    def test_least_recently_used_entry_is_evicted(self) -> None:
+        cache = TTLCache[int](ttl=10, max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+
+
+class SingleFlightTest(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.flight = SingleFlight[int]()
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def fetch(self) -> int:
+        self.calls += 1
+        await self.release.wait()
+        return 42
+
+    async def test_concurrent_calls_share_execution(self) -> None:
+        tasks = [asyncio.create_task(self.flight.do('key', self.fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        self.release.set()
+        self.assertEqual(await asyncio.gather(*tasks), [42, 42, 42])
+        self.assertEqual(self.calls, 1)
+        self.assertFalse(self.flight.in_flight('key'))
+
+    async def test_follower_survives_leader_cancellation(self) -> None:
+        leader = asyncio.create_task(self.flight.do('key', self.fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(self.flight.do('key', self.fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        self.release.set()
+        self.assertEqual(await follower, 42)
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(self.calls, 1)
+
+    async def test_exception_is_raised_for_all_callers(self) -> None:
+        async def fail() -> int:
+            await self.release.wait()
+            raise ValueError('failed')
+
+        tasks = [asyncio.create_task(self.flight.do('key', fail)) for _ in range(2)]
+        await asyncio.sleep(0)
+        self.release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    async def test_forgotten_call_is_not_joined(self) -> None:
+        first = asyncio.create_task(self.flight.do('key', self.fetch))
+        await asyncio.sleep(0)
+        self.flight.forget('key')
+        second = asyncio.create_task(self.flight.do('key', self.fetch))
+        await asyncio.sleep(0)
+        self.release.set()
+        self.assertEqual(await asyncio.gather(first, second), [42, 42])
+        self.assertEqual(self.calls, 2)
+
+
+class AsyncCacheTest(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.values = iter(range(100))
+
+    async def fetch(self) -> int:
+        await asyncio.sleep(0)
+        return next(self.values)
+
+    async def test_value_is_cached(self) -> None:
+        cache = AsyncCache[int](ttl=10)
+        self.assertEqual(await cache.get_or_fetch('key', self.fetch), 0)
+        self.assertEqual(await cache.get_or_fetch('key', self.fetch), 0)
+
+    async def test_stale_value_is_refreshed_in_background(self) -> None:
+        cache = AsyncCache[int](ttl=0.05, stale_ttl=10)
+        await cache.get_or_fetch('key', self.fetch)
+        await asyncio.sleep(0.1)
+        self.assertEqual(await cache.get_or_fetch('key', self.fetch), 0)
+        await asyncio.sleep(0.01)
+        self.assertEqual(cache.cache.get_entry('key'), (1, True))
+
+    async def test_load_started_before_invalidation_is_not_cached(self) -> None:
+        cache = AsyncCache[int](ttl=10)
+        release = asyncio.Event()
+
+        async def slow_fetch() -> int:
+            await release.wait()
+            return next(self.values)
+
+        load = asyncio.create_task(cache.get_or_fetch('key', slow_fetch))
+        await asyncio.sleep(0)
+        cache.invalidate('key')
+        release.set()
+        self.assertEqual(await load, 0)
+        self.assertIsNone(cache.cache.get('key'))
+        self.assertEqual(await cache.get_or_fetch('key', self.fetch), 1)
@@ -0,0 +1,97 @@
+"""
+Coalescing of identical requests, run from the directory containing django_utils:
+python -m unittest django_utils.tests.test_coalescing
+"""
+from typing import Any
+from unittest import IsolatedAsyncioTestCase
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+from django_utils.coalescing import coalesced
+from django_utils.db_router import ReplicaPin, current_pin
+from django_utils.schema import AuthData
+import asyncio
+
+
+class CoalescedViewTest(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def view(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        self.calls += 1
+        await self.release.wait()
+        response.set_cookie('leader', str(self.calls))
+        result = HttpResponse(b'{"value": 1}', content_type='application/json', status=201)
+        result['ETag'] = '"v1"'
+        result['X-Request'] = str(self.calls)
+        return result
+
+    def make_request(self, path: str = '/items', user_id: int | None = None) -> HttpRequest:
+        request = RequestFactory().get(path)
+        if user_id is not None:
+            request.auth = AuthData(user_id=user_id) # type: ignore
+        return request
+
+    async def call_concurrently(self, view: Any, *requests: HttpRequest) -> list[tuple[Any, HttpResponse]]:
+        temporal_responses = [HttpResponse() for _ in requests]
+        tasks = [
+            asyncio.create_task(view(request, response=response))
+            for request, response in zip(requests, temporal_responses)
+        ]
+        await asyncio.sleep(0)
+        self.release.set()
+        return list(zip(await asyncio.gather(*tasks), temporal_responses))
+
+    async def test_identical_requests_share_execution(self) -> None:
+        view = coalesced(self.view)
+        (leader, leader_temporal), (follower, follower_temporal) = await self.call_concurrently(
+            view, self.make_request(), self.make_request(),
+        )
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(follower.content, leader.content)
+        self.assertIsNot(follower, leader)
+        self.assertEqual((follower.status_code, follower['ETag']), (201, '"v1"'))
+        self.assertEqual(leader['X-Request'], '1')
+        self.assertFalse(follower.has_header('X-Request'))
+        self.assertIn('leader', leader_temporal.cookies)
+        self.assertNotIn('leader', follower_temporal.cookies)
+
+    async def test_requests_of_different_users_are_not_shared(self) -> None:
+        view = coalesced(self.view)
+        await self.call_concurrently(view, self.make_request(user_id=1), self.make_request(user_id=2))
+        self.assertEqual(self.calls, 2)
+
+    async def test_different_queries_are_not_shared(self) -> None:
+        view = coalesced(self.view)
+        await self.call_concurrently(view, self.make_request('/items?page=1'), self.make_request('/items?page=2'))
+        self.assertEqual(self.calls, 2)
+
+    async def test_pinned_client_is_not_coalesced(self) -> None:
+        view = coalesced(self.view)
+        token = current_pin.set(ReplicaPin(pinned=True))
+        try:
+            await self.call_concurrently(view, self.make_request(), self.make_request())
+        finally:
+            current_pin.reset(token)
+        self.assertEqual(self.calls, 2)
+
+    async def test_completed_result_is_reused_for_ttl(self) -> None:
+        view = coalesced(self.view, ttl=10)
+        self.release.set()
+        await view(self.make_request(), response=HttpResponse())
+        follower_temporal = HttpResponse()
+        follower = await view(self.make_request(), response=follower_temporal)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(follower['ETag'], '"v1"')
+        self.assertNotIn('leader', follower_temporal.cookies)
+
+    async def test_streaming_response_is_not_shared(self) -> None:
+        async def stream_view(request: HttpRequest, response: HttpResponse) -> StreamingHttpResponse:
+            self.calls += 1
+            await self.release.wait()
+            return StreamingHttpResponse(iter([b'chunk']))
+
+        view = coalesced(stream_view)
+        results = await self.call_concurrently(view, self.make_request(), self.make_request())
+        self.assertEqual(self.calls, 2)
+        self.assertIsNot(results[0][0], results[1][0])
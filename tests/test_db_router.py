@@ -0,0 +1,65 @@
+"""
+Routing between two SQLite databases, run from the directory containing django_utils:
+python -m unittest django_utils.tests.test_db_router
+"""
+from unittest import TestCase
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django_utils.constants import REPLICA_PIN_COOKIE_NAME
+from django_utils.db_router import ReplicaPinMiddleware, current_pin, replica_reads
+import time
+
+
+class ReplicaRouterTest(TestCase):
+    """
+    Replica starts empty, so the number of rows shows which database served the read
+    """
+    @classmethod
+    def setUpClass(cls) -> None:
+        for alias in ('default', 'replica'):
+            with connections[alias].schema_editor() as editor:
+                editor.create_model(ContentType)
+
+    def setUp(self) -> None:
+        ContentType.objects.all().delete()
+        ContentType.objects.create(app_label='items', model='item')
+
+    def test_reads_outside_of_scope_use_primary(self) -> None:
+        self.assertEqual(ContentType.objects.count(), 1)
+
+    def test_reads_in_scope_use_replica(self) -> None:
+        with replica_reads():
+            self.assertEqual(ContentType.objects.count(), 0)
+
+    def test_write_in_scope_pins_reads_to_primary(self) -> None:
+        with replica_reads():
+            ContentType.objects.create(app_label='items', model='order')
+            self.assertEqual(ContentType.objects.count(), 2)
+        self.assertEqual(ContentType.objects.using('replica').count(), 0)
+
+    def test_pin_cookie_routes_reads_to_primary(self) -> None:
+        request = RequestFactory().get('/')
+        request.COOKIES[REPLICA_PIN_COOKIE_NAME] = str(time.time() + 5)
+        counts: list[int] = []
+
+        def get_response(request: object) -> HttpResponse:
+            with replica_reads():
+                counts.append(ContentType.objects.count())
+            return HttpResponse()
+
+        ReplicaPinMiddleware(get_response)(request)
+        self.assertEqual(counts, [1])
+
+    def test_write_sets_pin_cookie(self) -> None:
+        def get_response(request: object) -> HttpResponse:
+            with replica_reads():
+                ContentType.objects.create(app_label='items', model='order')
+            return HttpResponse()
+
+        response = ReplicaPinMiddleware(get_response)(RequestFactory().get('/'))
+        cookie = response.cookies[REPLICA_PIN_COOKIE_NAME]
+        self.assertEqual(cookie['path'], '/app')
+        self.assertFalse(cookie['secure'])
+        self.assertIsNone(current_pin.get())
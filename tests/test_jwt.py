@@ -0,0 +1,125 @@
+"""
+Verified token cache and session store, run from the directory containing django_utils:
+python -m unittest django_utils.tests.test_jwt
+"""
+from unittest import TestCase
+from typing import Any
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django_utils import jwt as jwt_utils
+import datetime
+import jwt
+import secrets
+import time
+
+
+def encode(payload: dict[str, Any], secret: str | None = None) -> str:
+    return jwt.encode(payload, secret or settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+
+
+class CountingDecoder:
+    """
+    Decoder passed to decode_verified, counts tokens that were actually verified
+    """
+    def __init__(self) -> None:
+        self.calls = 0
+        self.__name__ = 'counting_decoder'
+
+    def __call__(self, token: str) -> Any:
+        self.calls += 1
+        return jwt_utils.decode_jwt(token)
+
+
+class TokenCacheTest(TestCase):
+    def setUp(self) -> None:
+        jwt_utils.get_token_cache().clear()
+        self.decoder = CountingDecoder()
+
+    def test_valid_token_is_verified_once(self) -> None:
+        token = encode({'user_id': 1, 'exp': int(time.time()) + 60})
+        first = jwt_utils.decode_verified(token, self.decoder)
+        second = jwt_utils.decode_verified(token, self.decoder)
+        self.assertEqual(self.decoder.calls, 1)
+        self.assertIs(first, second)
+        self.assertEqual(first, {'user_id': 1, 'exp': first['exp']})
+
+    def test_cached_token_expires_with_exp_claim(self) -> None:
+        exp = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=1)
+        token = encode({'user_id': 1, 'exp': exp})
+        self.assertIsNotNone(jwt_utils.decode_verified(token, self.decoder))
+        time.sleep(max(0, exp.timestamp() - time.time()) + 0.1)
+        self.assertIsNone(jwt_utils.decode_verified(token, self.decoder))
+        self.assertEqual(self.decoder.calls, 2)
+
+    @override_settings(JWT_INVALID_TOKEN_CACHE_TTL=0.05)
+    def test_invalid_signature_is_cached_as_none(self) -> None:
+        token = encode({'user_id': 1}, secret='other-secret-with-recommended-length-32')
+        self.assertIsNone(jwt_utils.decode_verified(token, self.decoder))
+        self.assertIsNone(jwt_utils.decode_verified(token, self.decoder))
+        self.assertEqual(self.decoder.calls, 1)
+        time.sleep(0.1)
+        self.assertIsNone(jwt_utils.decode_verified(token, self.decoder))
+        self.assertEqual(self.decoder.calls, 2)
+
+    def test_expired_token_is_cached_as_none(self) -> None:
+        token = encode({'user_id': 1, 'exp': int(time.time()) - 1})
+        self.assertIsNone(jwt_utils.decode_verified(token, self.decoder))
+        self.assertIsNone(jwt_utils.decode_verified(token, self.decoder))
+        self.assertEqual(self.decoder.calls, 1)
+
+    def test_token_of_other_type_is_rejected_from_cache(self) -> None:
+        token = jwt_utils.create_refresh_token(1)
+        self.assertIsNotNone(jwt_utils.decode_jwt_token(token, 'refresh'))
+        self.assertIsNone(jwt_utils.decode_jwt_token(token, 'access'))
+
+
+@override_settings(JWT_SESSION_COMPACT=True)
+class CompactSessionTest(SimpleTestCase):
+    def setUp(self) -> None:
+        jwt_utils.get_token_cache().clear()
+
+    def save(self, data: dict[str, Any]) -> str:
+        store = jwt_utils.SessionStore()
+        store.update(data)
+        store.save()
+        assert store.session_key is not None
+        return store.session_key
+
+    def test_round_trip(self) -> None:
+        data = {'_auth_user_id': '1', 'groups': ['staff'] * 50}
+        session_key = self.save(data)
+        self.assertTrue(session_key.startswith(jwt_utils.COMPACT_SESSION_PREFIX))
+        self.assertEqual(jwt_utils.SessionStore(session_key).load(), data)
+
+    def test_compact_key_is_smaller_than_jwt(self) -> None:
+        data = {'_auth_user_id': '1', 'groups': ['staff'] * 50}
+        with override_settings(JWT_SESSION_COMPACT=False):
+            jwt_key = self.save(data)
+        self.assertLess(len(self.save(data)), len(jwt_key))
+
+    def test_jwt_key_is_accepted(self) -> None:
+        with override_settings(JWT_SESSION_COMPACT=False):
+            session_key = self.save({'_auth_user_id': '1'})
+        self.assertEqual(jwt_utils.SessionStore(session_key).load(), {'_auth_user_id': '1'})
+
+    def test_tampered_key_resets_session(self) -> None:
+        session_key = self.save({'_auth_user_id': '1'})
+        store = jwt_utils.SessionStore(session_key[:-2] + 'xx')
+        self.assertEqual(store.load(), {})
+
+    def test_unchanged_session_keeps_key(self) -> None:
+        session_key = self.save({'_auth_user_id': '1'})
+        store = jwt_utils.SessionStore(session_key)
+        store.load()
+        store.save()
+        self.assertEqual(store.session_key, session_key)
+
+    def test_session_too_large(self) -> None:
+        # Random data is not compressible, so the key size is stable
+        data = {'data': secrets.token_hex(1000)}
+        size = len(self.save(data))
+        with override_settings(JWT_SESSION_MAX_SIZE=size):
+            self.save(data)
+        with override_settings(JWT_SESSION_MAX_SIZE=size - 1):
+            with self.assertRaises(jwt_utils.SessionTooLarge):
+                self.save(data)
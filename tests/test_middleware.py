@@ -0,0 +1,139 @@
+"""
+Session and user data cookies and compression, run from the directory containing django_utils:
+python -m unittest django_utils.tests.test_middleware
+"""
+from typing import Any
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.http import HttpRequest, HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django_utils import middleware
+from django_utils.jwt import get_token_cache
+from django_utils.middleware import CompressionMiddleware, JwtSessionMiddleware, StreamCompressor
+import base64
+import gzip
+import json
+
+USER_DATA_COOKIE = 'user_data'
+
+
+@override_settings(SESSION_ENGINE='django_utils.jwt', USER_DATA_COOKIE_NAME=USER_DATA_COOKIE)
+class JwtSessionMiddlewareTest(SimpleTestCase):
+    """
+    Sync and async paths of the middleware produce the same cookies
+    """
+    def setUp(self) -> None:
+        get_token_cache().clear()
+        self.user_data_calls = 0
+
+        async def get_user_data(request: HttpRequest) -> dict[str, Any]:
+            self.user_data_calls += 1
+            return {'id': request.session['_auth_user_id']}
+
+        # Cache is created with TTL of the settings at the first use
+        for name, value in (('get_user_data', get_user_data), ('_encoded_user_data_cache', None)):
+            patcher = mock.patch.object(middleware, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def login_view(self, request: HttpRequest) -> HttpResponse:
+        request.session['_auth_user_id'] = '1'
+        return HttpResponse()
+
+    async def alogin_view(self, request: HttpRequest) -> HttpResponse:
+        return self.login_view(request)
+
+    def call_sync(self, request: HttpRequest) -> HttpResponse:
+        return JwtSessionMiddleware(self.login_view)(request)
+
+    def call_async(self, request: HttpRequest) -> HttpResponse:
+        return async_to_sync(JwtSessionMiddleware(self.alogin_view))(request)
+
+    def get_cookies(self, response: HttpResponse) -> dict[str, tuple[str, str, bool, bool]]:
+        # Expires depends on the current time, it is not compared
+        return {
+            name: (morsel.value, morsel['path'], bool(morsel['secure']), bool(morsel['httponly']))
+            for name, morsel in response.cookies.items()
+        }
+
+    def test_sync_and_async_cookies_are_equal(self) -> None:
+        sync_cookies = self.get_cookies(self.call_sync(RequestFactory().get('/')))
+        async_cookies = self.get_cookies(self.call_async(RequestFactory().get('/')))
+        self.assertEqual(sync_cookies, async_cookies)
+        self.assertEqual(set(sync_cookies), {'sessionid', USER_DATA_COOKIE})
+        user_data = json.loads(base64.b64decode(sync_cookies[USER_DATA_COOKIE][0]))
+        self.assertEqual(user_data, {'id': '1'})
+        self.assertEqual(sync_cookies[USER_DATA_COOKIE][1:], ('/app', True, False))
+
+    def test_current_user_data_cookie_is_not_set_again(self) -> None:
+        for call in (self.call_sync, self.call_async):
+            with self.subTest(call=call.__name__):
+                cookies = self.call_sync(RequestFactory().get('/')).cookies
+                request = RequestFactory().get('/')
+                request.COOKIES[USER_DATA_COOKIE] = cookies[USER_DATA_COOKIE].value
+                self.assertNotIn(USER_DATA_COOKIE, call(request).cookies)
+
+    @override_settings(USER_DATA_COOKIE_CACHE_TTL=60)
+    def test_cached_user_data_is_used_by_both_paths(self) -> None:
+        sync_cookies = self.get_cookies(self.call_sync(RequestFactory().get('/')))
+        async_cookies = self.get_cookies(self.call_async(RequestFactory().get('/')))
+        self.assertEqual(sync_cookies, async_cookies)
+        self.assertEqual(self.user_data_calls, 1)
+
+    def test_user_data_cookie_is_deleted_for_empty_session(self) -> None:
+        def view(request: HttpRequest) -> HttpResponse:
+            return HttpResponse()
+
+        async def aview(request: HttpRequest) -> HttpResponse:
+            return HttpResponse()
+
+        for call in (JwtSessionMiddleware(view), async_to_sync(JwtSessionMiddleware(aview))):
+            request = RequestFactory().get('/')
+            request.COOKIES[USER_DATA_COOKIE] = 'stale'
+            response = call(request)
+            self.assertEqual(response.cookies[USER_DATA_COOKIE].value, '')
+
+
+class StreamCompressorTest(SimpleTestCase):
+    content = json.dumps([{'id': id, 'name': f'item {id}'} for id in range(200)]).encode('utf-8')
+
+    def compress(self, max_random_bytes: int, chunks: int = 1) -> bytes:
+        compressor = StreamCompressor('gzip', 6, max_random_bytes)
+        size = len(self.content) // chunks + 1
+        parts = [self.content[i:i + size] for i in range(0, len(self.content), size)]
+        return b''.join(compressor.compress_iterator(iter(parts)))
+
+    def test_padded_output_is_valid_gzip(self) -> None:
+        for chunks in (1, 5):
+            with self.subTest(chunks=chunks):
+                self.assertEqual(gzip.decompress(self.compress(100, chunks)), self.content)
+
+    def test_padded_output_size_varies(self) -> None:
+        sizes = {len(self.compress(100)) for _ in range(20)}
+        self.assertGreater(len(sizes), 1)
+        self.assertLessEqual(max(sizes) - min(sizes), 100)
+
+    def test_output_without_padding_has_constant_size(self) -> None:
+        self.assertEqual(len({len(self.compress(0)) for _ in range(5)}), 1)
+
+    def test_deflate_is_not_negotiated_with_padding(self) -> None:
+        def view(request: HttpRequest) -> HttpResponse:
+            return HttpResponse(self.content, content_type='application/json')
+
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='deflate')
+        with override_settings(COMPRESSION_MAX_RANDOM_BYTES=100):
+            self.assertFalse(CompressionMiddleware(view)(request).has_header('Content-Encoding'))
+        with override_settings(COMPRESSION_MAX_RANDOM_BYTES=0):
+            self.assertEqual(CompressionMiddleware(view)(request)['Content-Encoding'], 'deflate')
+
+    def test_compressed_response_round_trips(self) -> None:
+        def view(request: HttpRequest) -> HttpResponse:
+            response = HttpResponse(self.content, content_type='application/json')
+            response['ETag'] = '"v1"'
+            return response
+
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        response = CompressionMiddleware(view)(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], 'W/"v1"')
+        self.assertEqual(gzip.decompress(response.content), self.content)
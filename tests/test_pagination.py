@@ -0,0 +1,92 @@
+"""
+Keyset pagination filters, run from the directory containing django_utils:
+python -m unittest django_utils.tests.test_pagination
+Postgres SQL is compiled without connecting, it requires only psycopg to be installed
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from unittest import TestCase, mock, skipIf
+from django.db import connections, models
+from django.db.utils import ConnectionHandler
+from django_utils import pagination
+from django_utils.pagination import keyset_filter
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+
+class Event(models.Model):
+    created_at = models.DateTimeField()
+
+    class Meta:
+        app_label = 'tests'
+
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def get_ids(qset: models.QuerySet[Any]) -> list[int]:
+    return list(qset.order_by('created_at', 'id').values_list('id', flat=True))
+
+
+class KeysetFilterTest(TestCase):
+    """
+    Events 1-6, two per timestamp, so the position is in the middle of equal dates
+    """
+    @classmethod
+    def setUpClass(cls) -> None:
+        with connections['default'].schema_editor() as editor:
+            editor.create_model(Event)
+        Event.objects.bulk_create([
+            Event(id=id, created_at=START + timedelta(seconds=(id - 1) // 2)) for id in range(1, 7)
+        ])
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        with connections['default'].schema_editor() as editor:
+            editor.delete_model(Event)
+
+    def test_before_position(self) -> None:
+        qset = keyset_filter(Event.objects.all(), 'created_at', START + timedelta(seconds=1), 4, after=False)
+        self.assertEqual(get_ids(qset), [1, 2, 3])
+
+    def test_after_position(self) -> None:
+        qset = keyset_filter(Event.objects.all(), 'created_at', START + timedelta(seconds=1), 3, after=True)
+        self.assertEqual(get_ids(qset), [4, 5, 6])
+
+    def test_without_id_only_date_is_compared(self) -> None:
+        qset = keyset_filter(Event.objects.all(), 'created_at', START + timedelta(seconds=1), None, after=True)
+        self.assertEqual(get_ids(qset), [5, 6])
+
+    def test_sqlite_uses_expanded_condition(self) -> None:
+        qset = keyset_filter(Event.objects.all(), 'created_at', START, 1, after=True)
+        self.assertIn(' OR ', str(qset.query))
+
+
+@skipIf(psycopg is None, 'psycopg is not installed')
+class PostgresKeysetFilterTest(TestCase):
+    def setUp(self) -> None:
+        self.connections = ConnectionHandler({'default': {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'test'}})
+        patcher = mock.patch.object(pagination, 'connections', self.connections)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def compile(self, qset: models.QuerySet[Any]) -> tuple[str, tuple[Any, ...]]:
+        return qset.query.get_compiler(connection=self.connections['default']).as_sql()
+
+    def test_row_value_comparison(self) -> None:
+        for after, operator in ((False, '<'), (True, '>')):
+            with self.subTest(after=after):
+                qset = keyset_filter(Event.objects.all(), 'created_at', START, 5, after=after)
+                sql, params = self.compile(qset)
+                self.assertIn(
+                    f'WHERE ("tests_event"."created_at", "tests_event"."id") {operator} (%s, %s)', sql,
+                )
+                self.assertEqual(params, (START, 5))
+
+    def test_without_id_row_value_is_not_used(self) -> None:
+        sql, params = self.compile(keyset_filter(Event.objects.all(), 'created_at', START, None, after=False))
+        self.assertIn('WHERE "tests_event"."created_at" < %s', sql)
+        self.assertEqual(params, (START,))
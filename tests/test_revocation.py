@@ -0,0 +1,45 @@
+"""
+Revoked token filter, run from the directory containing django_utils:
+python -m unittest django_utils.tests.test_revocation
+"""
+from unittest import IsolatedAsyncioTestCase, TestCase
+from django.test import override_settings
+from django_utils.revocation import BloomFilter, MIN_BLOOM_CAPACITY, RevocationFilter, is_token_revoked
+import uuid
+
+
+class BloomFilterTest(TestCase):
+    def test_added_items_are_found(self) -> None:
+        bloom = BloomFilter(5000)
+        items = [uuid.uuid4().hex for _ in range(5000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+
+    def test_false_positive_rate_is_close_to_target(self) -> None:
+        bloom = BloomFilter(5000, false_positive_rate=0.01)
+        for _ in range(5000):
+            bloom.add(uuid.uuid4().hex)
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(20000))
+        self.assertLess(false_positives / 20000, 0.02)
+
+    def test_small_capacity_is_raised_to_minimum(self) -> None:
+        self.assertEqual(BloomFilter(1).size, BloomFilter(MIN_BLOOM_CAPACITY).size)
+
+    def test_empty_filter_contains_nothing(self) -> None:
+        self.assertNotIn(uuid.uuid4().hex, BloomFilter(10))
+
+
+class RevocationFilterTest(IsolatedAsyncioTestCase):
+    @override_settings(REVOKED_TOKEN_MODEL=None)
+    async def test_revocation_is_disabled_without_model(self) -> None:
+        self.assertFalse(await RevocationFilter().is_revoked(uuid.uuid4().hex))
+
+    async def test_token_without_jti_is_not_revoked(self) -> None:
+        self.assertFalse(await is_token_revoked({'user_id': 1}))
+
+    def test_added_token_is_matched_before_refresh(self) -> None:
+        revocation = RevocationFilter()
+        revocation.bloom = BloomFilter(10)
+        revocation.add('revoked')
+        self.assertIn('revoked', revocation.bloom)
@@ -0,0 +1,146 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+from django.conf import settings
+from django.http import HttpRequest
+from django.http.response import HttpResponseBase
+from ninja.renderers import JSONRenderer
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django_utils.db_hooks import register_query_observer
+from django_utils.schema import AuthData
+import time
+
+try:
+    import sentry_sdk
+except ImportError:
+    sentry_sdk = None
+
+
+@dataclass(slots=True)
+class RequestTimings:
+    """
+    Durations of request phases in seconds and counters, phases can be nested (e.g. db inside page)
+    """
+    durations: dict[str, float] = field(default_factory=dict)
+    counts: dict[str, int] = field(default_factory=dict)
+
+    def add(self, name: str, duration: float) -> None:
+        self.durations[name] = self.durations.get(name, 0) + duration
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def server_timing(self) -> str:
+        metrics = [f'{name};dur={duration * 1000:.1f}' for name, duration in self.durations.items()]
+        metrics += [f'{name};desc="{amount}"' for name, amount in self.counts.items()]
+        return ', '.join(metrics)
+
+
+current_timings: ContextVar[RequestTimings | None] = ContextVar('django_utils_timings', default=None)
+
+
+def sentry_enabled() -> bool:
+    return sentry_sdk is not None and getattr(settings, 'SENTRY_DSN', None) is not None
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """
+    Adds duration of the block to the request timings and to Sentry as a span
+    Does nothing outside of TimingMiddleware
+    """
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        if sentry_enabled():
+            with sentry_sdk.start_span(op=f'django_utils.{name}'): # type: ignore
+                yield
+        else:
+            yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def count(name: str, amount: int = 1) -> None:
+    timings = current_timings.get()
+    if timings is not None:
+        timings.count(name, amount)
+
+
+def observe_query(sql: str, duration: float, rows: int | None) -> None:
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add('db', duration)
+        timings.count('queries')
+
+
+register_query_observer(observe_query)
+
+
+class TimingJSONRenderer(JSONRenderer):
+    """
+    Measures ninja serialization, set as NinjaAPI(renderer=TimingJSONRenderer())
+    """
+    def render(self, request: HttpRequest, data: Any, *, response_status: int) -> Any:
+        with timed('serialize'):
+            return super().render(request, data, response_status=response_status)
+
+
+def is_timing_visible(request: HttpRequest) -> bool:
+    """
+    SERVER_TIMING setting: True for all requests, 'staff' only for staff users by access token or session claims
+    """
+    mode = getattr(settings, 'SERVER_TIMING', False)
+    if mode == 'staff':
+        auth = getattr(request, 'auth', None)
+        return isinstance(auth, AuthData) and bool(auth.is_staff or auth.is_superuser)
+    return bool(mode)
+
+
+class TimingMiddleware:
+    """
+    Collects per request phase durations, query and row counts and returns them in Server-Timing header
+    Should be placed first in the middleware list
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.async_mode:
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.process_response(request, response, timings, started)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponseBase:
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.process_response(request, response, timings, started)
+
+    def process_response(
+        self, request: HttpRequest, response: HttpResponseBase, timings: RequestTimings, started: float
+    ) -> HttpResponseBase:
+        if is_timing_visible(request):
+            timings.add('total', time.perf_counter() - started)
+            response['Server-Timing'] = timings.server_timing()
+        return response
@@ -0,0 +1,90 @@
+from typing import Any
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AbstractBaseUser
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django_utils.cache import AsyncCache
+from django_utils.metrics import Counter
+import copy
+
+DEFAULT_USER_CACHE_TTL = 60
+DEFAULT_USER_CACHE_MAX_SIZE = 10000
+USER_CACHE_KEY_PREFIX = 'django_utils:user:'
+
+user_cache_lookups = Counter('user_cache_lookups', 'Users requested from the user cache')
+user_cache_db_lookups = Counter('user_cache_db_lookups', 'Users fetched from the database on cache miss')
+
+_user_cache: AsyncCache[AbstractBaseUser | None] | None = None
+
+
+def get_user_cache_options() -> dict[str, Any]:
+    """
+    USER_CACHE setting: ttl, max_size and optional name of the shared django cache (backend)
+    Snapshots are kept in process memory, ttl bounds how long other processes can see a changed user
+    """
+    return getattr(settings, 'USER_CACHE', {})
+
+
+def get_user_cache() -> AsyncCache[AbstractBaseUser | None]:
+    global _user_cache
+    if _user_cache is None:
+        options = get_user_cache_options()
+        _user_cache = AsyncCache(
+            ttl=options.get('ttl', DEFAULT_USER_CACHE_TTL),
+            max_size=options.get('max_size', DEFAULT_USER_CACHE_MAX_SIZE),
+        )
+    return _user_cache
+
+
+def get_shared_key(user_id: Any) -> str:
+    return f'{USER_CACHE_KEY_PREFIX}{user_id}'
+
+
+async def fetch_user(user_id: Any) -> AbstractBaseUser | None:
+    options = get_user_cache_options()
+    backend = options.get('backend')
+    if backend is not None:
+        user = await caches[backend].aget(get_shared_key(user_id))
+        if user is not None:
+            return user
+    user_cache_db_lookups.inc()
+    user_model = get_user_model()
+    user = await user_model._default_manager.filter(pk=user_id).afirst()
+    if user is not None and backend is not None and not get_user_cache().is_load_invalidated():
+        await caches[backend].aset(get_shared_key(user_id), user, options.get('ttl', DEFAULT_USER_CACHE_TTL))
+    return user
+
+
+async def aget_cached_user(user_id: Any) -> AbstractBaseUser | None:
+    """
+    Snapshot of the user, None if user does not exist
+    Save and delete of the user invalidate the snapshot of the current process and the shared USER_CACHE backend,
+    other processes and queryset updates see the change only after ttl
+    Each call returns a copy, so callers can modify it
+    """
+    user_cache_lookups.inc()
+    user = await get_user_cache().get_or_fetch(user_id, lambda: fetch_user(user_id))
+    return copy.copy(user)
+
+
+def invalidate_user(user_id: Any) -> None:
+    """
+    Load of the user already in flight doesn't store its result, it may have read the row before the change
+    """
+    get_user_cache().invalidate(user_id)
+    backend = get_user_cache_options().get('backend')
+    if backend is not None:
+        caches[backend].delete(get_shared_key(user_id))
+
+
+def on_user_changed(sender: Any, instance: Any, **kwargs: Any) -> None:
+    # Loads started before commit still read the old row, so the snapshot is invalidated again after commit
+    user_id = instance.pk
+    invalidate_user(user_id)
+    transaction.on_commit(lambda: invalidate_user(user_id), using=kwargs.get('using'))
+
+
+post_save.connect(on_user_changed, sender=settings.AUTH_USER_MODEL, dispatch_uid='django_utils_user_cache_save')
+post_delete.connect(on_user_changed, sender=settings.AUTH_USER_MODEL, dispatch_uid='django_utils_user_cache_delete')
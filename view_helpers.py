@@ -0,0 +1,56 @@
+from functools import wraps
+from typing import Any, Awaitable, Callable
+from django.http import HttpRequest, HttpResponse
+import inspect
+
+TEMPORAL_RESPONSE_ARG = 'temporal_response'
+
+ViewCall = Callable[[], Awaitable[Any]]
+ViewHandler = Callable[[ViewCall, HttpRequest, HttpResponse], Awaitable[Any]]
+
+
+def get_response_arg(func: Callable[..., Any]) -> str | None:
+    """
+    Name of the parameter ninja fills with temporal response, None if view does not declare it
+    """
+    for name, param in inspect.signature(func).parameters.items():
+        if param.annotation is HttpResponse:
+            return name
+    return None
+
+
+def wrap_view(func: Callable[..., Any], handler: ViewHandler) -> Callable[..., Any]:
+    """
+    Wraps ninja view function, handler receives the call of the original view, request
+    and temporal response, which is used by ninja for headers and cookies of the final response
+    Temporal response parameter is added to the view signature if function does not declare it
+    """
+    response_arg = get_response_arg(func)
+
+    @wraps(func)
+    async def view(request: HttpRequest, *args: Any, **kwargs: Any) -> Any:
+        if response_arg is None:
+            response = kwargs.pop(TEMPORAL_RESPONSE_ARG)
+        else:
+            response = kwargs[response_arg]
+
+        async def call() -> Any:
+            result = func(request, *args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+
+        return await handler(call, request, response)
+
+    if response_arg is None:
+        signature = inspect.signature(func)
+        params = list(signature.parameters.values())
+        response_param = inspect.Parameter(
+            TEMPORAL_RESPONSE_ARG, inspect.Parameter.KEYWORD_ONLY, annotation=HttpResponse
+        )
+        position = len(params)
+        if params and params[-1].kind == inspect.Parameter.VAR_KEYWORD:
+            position -= 1
+        params.insert(position, response_param)
+        view.__signature__ = signature.replace(parameters=params) # type: ignore
+    return view